@@ -9,7 +9,8 @@ from services.alerts import check_and_trigger_alerts
 app = Flask(__name__)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+if not logging.getLogger().handlers:
+    logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 async def update_all_products():
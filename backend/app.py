@@ -4,30 +4,33 @@ from dotenv import load_dotenv
 import os
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor as SchedulerThreadPool
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import atexit
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timezone
 
 from routes.products import products_bp
 from routes.alerts import alerts_bp
 from routes.health import health_bp
 from routes.compare import compare_bp
 from services.scheduler import update_all_prices
-from models.db import init_db
-from services.scraper import AmazonScraper
+from models.db import init_db, get_engine_options
 from services.email_service import EmailService
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log") if not os.getenv('VERCEL') else logging.StreamHandler(),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging, unless the host process (gunicorn, a worker, tests) already has
+if not logging.getLogger().handlers:
+    # One stderr handler everywhere, plus a log file where the filesystem is writable (not on Vercel);
+    # basicConfig gives them a single shared Formatter
+    log_handlers = [logging.StreamHandler()]
+    if not os.getenv('VERCEL'):
+        log_handlers.append(logging.FileHandler("app.log"))
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=log_handlers
+    )
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -58,6 +61,7 @@ limiter = Limiter(
 # Configure database
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///pricepulse.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 db = SQLAlchemy(app)
 
 # Configure email settings
@@ -66,8 +70,13 @@ app.config['SMTP_PORT'] = int(os.getenv('SMTP_PORT', 587))
 app.config['SMTP_USERNAME'] = os.getenv('SMTP_USERNAME')
 app.config['SMTP_PASSWORD'] = os.getenv('SMTP_PASSWORD')
 
-# Initialize scheduler
-scheduler = BackgroundScheduler()
+# Initialize scheduler. Page fetches fan out on the price update's own pool, so the scheduler
+# only needs a thread per job; a late or slow run is coalesced rather than stacked.
+scheduler = BackgroundScheduler(
+    timezone=timezone.utc,
+    executors={'default': SchedulerThreadPool(max_workers=4)},
+    job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 300}
+)
 scheduler.start()
 
 # Register blueprints
@@ -77,7 +86,6 @@ app.register_blueprint(health_bp, url_prefix='/api/health')
 app.register_blueprint(compare_bp, url_prefix='/api/compare')
 
 # Initialize services
-scraper = AmazonScraper()
 email_service = EmailService(
     app.config['SMTP_SERVER'],
     app.config['SMTP_PORT'],
@@ -130,6 +138,7 @@ if __name__ == '__main__':
         db.create_all()
     
     port = int(os.getenv('PORT', 5000))
-    debug = os.getenv('FLASK_ENV', 'development') == 'development'
+    # Debug (reloader + debugger) only when explicitly requested; production runs under gunicorn
+    debug = os.getenv('FLASK_ENV') == 'development'
     
     app.run(host='0.0.0.0', port=port, debug=debug)
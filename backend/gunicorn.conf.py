@@ -0,0 +1,43 @@
+"""
+Gunicorn configuration, picked up automatically by `gunicorn app:app`
+when started from the backend directory.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# The API is I/O-bound on the database, SMTP and scraping, so threads per worker.
+# cpu_count() reports the host's CPUs inside containers, so default to a small fixed count.
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Load the app once in the master and fork workers from it: imports, the SQLAlchemy
+# engine and the shared HTTP session are shared copy-on-write, and the
+# BackgroundScheduler started at import runs once in the master rather than per worker
+preload_app = True
+
+def post_fork(server, worker):
+    """
+    Drop connections inherited from the master, where the scheduler's price updates
+    use the database pool, the HTTP sessions and SMTP; each worker opens its own
+    """
+    # app.py registers its own SQLAlchemy instance; models.db.db is never bound to this app
+    from app import app, db
+    from services.http_client import SESSION
+    from services.flipkart_scraper import FLIPKART_SESSION
+    from services.email_service import discard_smtp
+    
+    # A failed reset only costs a stale connection, so log it rather than fail the worker boot
+    try:
+        with app.app_context():
+            # close=False leaves the master's sockets alone and just forgets them in this process
+            db.engine.dispose(close=False)
+    except Exception:
+        worker.log.warning("Could not reset the database pool after fork", exc_info=True)
+    try:
+        SESSION.close()
+        FLIPKART_SESSION.close()
+    except Exception:
+        worker.log.warning("Could not reset the HTTP sessions after fork", exc_info=True)
+    discard_smtp()
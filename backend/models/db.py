@@ -3,7 +3,9 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 import logging
-from sqlalchemy import create_engine
+import sqlite3
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.pool import NullPool
 
 # Load environment variables
@@ -15,6 +17,15 @@ logger = logging.getLogger(__name__)
 # Initialize SQLAlchemy
 db = SQLAlchemy()
 
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL journaling for SQLite so batched writes don't block readers"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 def get_db_url():
     """Get database URL with proper configuration for production/development"""
     database_url = os.getenv('DATABASE_URL')
@@ -37,15 +48,33 @@ def get_db_url():
     
     return database_url
 
+def get_engine_options(database_url):
+    """
+    Connection pool settings for the SQLAlchemy engine
+    Sized for gunicorn's gthread workers; SQLite keeps SQLAlchemy's default pool
+    """
+    if str(database_url).startswith('sqlite'):
+        return {}
+    
+    # Serverless functions are short-lived, so pooled connections would only linger on the server
+    if os.getenv('VERCEL'):
+        return {'poolclass': NullPool}
+    
+    # One connection per request thread in a worker, plus a little headroom for the scheduler
+    return {
+        'pool_size': int(os.getenv('GUNICORN_THREADS', 8)),
+        'max_overflow': 2,
+        'pool_pre_ping': True,  # Verify connections before using them
+        'pool_recycle': 1800,   # Recycle connections before server-side idle timeouts
+        'pool_use_lifo': True,  # Keep a few connections hot, let the rest idle out
+    }
+
 def init_db(app):
     """Initialize database with proper configuration"""
     # Configure SQLAlchemy
     app.config['SQLALCHEMY_DATABASE_URI'] = get_db_url()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_pre_ping': True,  # Verify connections before using them
-        'pool_recycle': 300,    # Recycle connections every 5 minutes
-    }
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     
     # Initialize SQLAlchemy with app
     db.init_app(app)
@@ -11,6 +11,10 @@ class PriceAlert(db.Model):
     triggered = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_price_alerts_product_email', product_id, email),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
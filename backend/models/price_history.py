@@ -9,6 +9,11 @@ class PriceHistory(db.Model):
     price = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Backs the per-product, time-ordered history lookup
+    __table_args__ = (
+        db.Index('ix_price_history_product_ts', product_id, timestamp),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
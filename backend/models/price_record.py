@@ -10,6 +10,11 @@ class PriceRecord(db.Model):
     platform = db.Column(db.String(50), nullable=False, default='Amazon') # Add platform column
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Lets per-product history and latest-price lookups (newest first) use an index scan instead of a sort
+    __table_args__ = (
+        db.Index('ix_price_records_product_ts', product_id, timestamp.desc()),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -15,7 +15,39 @@ class Product(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    price_history = db.relationship('PriceHistory', backref='product', lazy=True, cascade='all, delete-orphan')
+    # lazy='raise' turns accidental per-row loads (N+1) into errors; load explicitly with selectinload
+    price_history = db.relationship(
+        'PriceHistory',
+        backref=db.backref('product', lazy='raise'),
+        lazy='raise',
+        cascade='all, delete-orphan'
+    )
+    
+    @classmethod
+    def dict_columns(cls):
+        """Columns serialized by to_dict, for queries that skip ORM instantiation"""
+        return (
+            cls.id, cls.amazon_url, cls.title, cls.image_url, cls.current_price,
+            cls.target_price, cls.email, cls.created_at, cls.updated_at
+        )
+    
+    @staticmethod
+    def row_to_dict(row):
+        """Serialize a row selected with dict_columns() the same way as to_dict"""
+        data = dict(row)
+        data['created_at'] = data['created_at'].isoformat()
+        data['updated_at'] = data['updated_at'].isoformat()
+        return data
+    
+    def record_price(self, price, at=None):
+        """Store the latest scraped price so readers never need to query price history for it"""
+        self.current_price = price
+        self.updated_at = at or datetime.utcnow()
+    
+    @staticmethod
+    def price_update_row(product_id, price, at):
+        """record_price as a primary-key row for an executemany bulk UPDATE"""
+        return {'id': product_id, 'current_price': price, 'updated_at': at}
     
     def to_dict(self):
         return {
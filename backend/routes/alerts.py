@@ -1,17 +1,20 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, jsonify, current_app
 import asyncio
 import logging
-import traceback
 import re
 from datetime import datetime
 from models.db import db
 from models.product import Product
 from models.price_alert import PriceAlert
 from services.database import insert_price_alert, get_product_by_id
+from utils.json_response import load_json_body
+import orjson
 
 logger = logging.getLogger(__name__)
 alerts_bp = Blueprint('alerts', __name__)
 
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 def run_async(coro):
     """Helper function to run async functions in sync context"""
     # Use existing event loop if available
@@ -32,7 +35,14 @@ def create_alert():
     """Create a new price alert for a product"""
     try:
         logger.info("Price alert creation request received")
-        data = request.get_json()
+        try:
+            data = load_json_body()
+        except orjson.JSONDecodeError:
+            logger.error("Malformed JSON in request")
+            return jsonify({
+                'success': False,
+                'message': 'Invalid JSON'
+            }), 400
         
         if not data:
             logger.error("No JSON data in request")
@@ -52,8 +62,7 @@ def create_alert():
                 }), 400
         
         # Validate email format
-        email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_regex, data['email']):
+        if not _EMAIL_RE.match(data['email']):
             logger.error(f"Invalid email format: {data['email']}")
             return jsonify({
                 'success': False,
@@ -73,7 +82,7 @@ def create_alert():
             logger.warning(f"Async product query failed, using direct query: {str(e)}")
             try:
                 # Fallback to direct SQLAlchemy query if async fails
-                product_obj = Product.query.get(product_id)
+                product_obj = db.session.get(Product, product_id)
                 if product_obj:
                     product = product_obj.to_dict()
                     logger.info("Successfully retrieved product using direct query")
@@ -182,8 +191,8 @@ def create_alert():
             'alert': alert_dict
         }), 201
     except Exception as e:
-        error_traceback = traceback.format_exc()
-        logger.error(f"Error creating price alert: {str(e)}\n{error_traceback}")
+        logger.error("Error creating price alert: %s", e)
+        logger.debug("Error details", exc_info=True)
         return jsonify({
             'success': False,
             'message': 'Failed to create price alert. Please try again.',
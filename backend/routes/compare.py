@@ -1,6 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app
 import logging
-import traceback
 import random
 from datetime import datetime
 from services.ai_service import extract_product_metadata, search_other_platforms
@@ -84,8 +83,8 @@ def compare_prices():
             'comparisons': comparisons
         }), 200
     except Exception as e:
-        error_traceback = traceback.format_exc()
-        logger.error(f"Error comparing prices: {str(e)}\n{error_traceback}")
+        logger.error("Error comparing prices: %s", e)
+        logger.debug("Error details", exc_info=True)
         return jsonify({
             'success': False,
             'message': 'Failed to compare prices. Please try again.',
@@ -1,20 +1,95 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from models.db import db
+from sqlalchemy.orm import selectinload
 from models.product import Product
 from models.price_history import PriceHistory
 from services.scraper import AmazonScraper
-from datetime import datetime
+from utils.json_response import ojsonify, load_json_body, json_bytes_response
+from services.cache import get_cached_products_response, cache_products_response, invalidate_products_cache
+import orjson
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 logger = logging.getLogger(__name__)
 products_bp = Blueprint('products', __name__)
 scraper = AmazonScraper()
 
+# Scrapes for newly added products run here so add_product does not block on Amazon
+scrape_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='product-scrape')
+
+# Price history window defaults: rows returned without ?limit=, hard cap, and days covered without ?since=
+DEFAULT_HISTORY_LIMIT = 500
+MAX_HISTORY_LIMIT = 5000
+DEFAULT_HISTORY_DAYS = 30
+
+def _discard_placeholder(product_id):
+    """
+    Delete a product whose first scrape failed, so the URL can be added again and
+    the null-title row does not keep the products list out of the response cache
+    """
+    try:
+        # title IS NULL: leave the row alone if something filled it in meanwhile
+        deleted = Product.query.filter_by(id=product_id, title=None).delete(synchronize_session=False)
+        db.session.commit()
+        if deleted:
+            invalidate_products_cache()
+            logger.info(f"Removed product {product_id} after its first scrape failed")
+    except Exception as e:
+        logger.error(f"Error removing unscraped product {product_id}: {str(e)}")
+        db.session.rollback()
+
+def _scrape_new_product(app, product_id, amazon_url):
+    """Fill in a newly added product's details and initial price history"""
+    # The fetch needs no app context; push one only for the DB work
+    success, data = scraper.scrape_product(amazon_url)
+    if not success:
+        logger.error(f"Failed to scrape new product {product_id}: {data.get('error')}")
+        with app.app_context():
+            _discard_placeholder(product_id)
+        return
+
+    with app.app_context():
+        try:
+            product = db.session.get(Product, product_id)
+            if product is None:
+                # Deleted before the scrape finished
+                return
+
+            product.title = data['title']
+            product.image_url = data['image_url']
+            product.record_price(data['current_price'])
+
+            # Add initial price history
+            price_history = PriceHistory(
+                product_id=product_id,
+                price=data['current_price']
+            )
+            db.session.add(price_history)
+            db.session.commit()
+            invalidate_products_cache()
+            logger.info(f"Scraped details for new product {product_id}")
+
+        except Exception as e:
+            logger.error(f"Error scraping new product {product_id}: {str(e)}")
+            db.session.rollback()
+            _discard_placeholder(product_id)
+
 @products_bp.route('/products', methods=['POST'])
 def add_product():
-    """Add a new product to track"""
+    """
+    Add a new product to track
+    Responds 202 with a partial record (title, image_url and current_price are null) while the
+    product is scraped in the background; if that scrape fails the product is removed again
+    """
     try:
-        data = request.get_json()
+        try:
+            data = load_json_body()
+        except orjson.JSONDecodeError:
+            return jsonify({'error': 'Invalid JSON'}), 400
+        if not data:
+            return jsonify({'error': 'Missing required fields'}), 400
+
         amazon_url = data.get('amazon_url')
         target_price = data.get('target_price')
         email = data.get('email')
@@ -26,36 +101,29 @@ def add_product():
         if not scraper.is_valid_amazon_url(amazon_url):
             return jsonify({'error': 'Invalid Amazon URL'}), 400
 
-        # Check if product already exists
-        existing_product = Product.query.filter_by(amazon_url=amazon_url).first()
-        if existing_product:
+        # Check if product already exists (id only; served by the unique index on amazon_url)
+        existing_id = db.session.query(Product.id).filter_by(amazon_url=amazon_url).scalar()
+        if existing_id is not None:
             return jsonify({'error': 'Product already being tracked'}), 409
 
-        # Scrape product details
-        success, data = scraper.scrape_product(amazon_url)
-        if not success:
-            return jsonify({'error': data.get('error', 'Failed to scrape product details')}), 400
-
-        # Create new product
+        # Create the product now; details and the first price are filled in by a background scrape
         product = Product(
             amazon_url=amazon_url,
-            title=data['title'],
-            image_url=data['image_url'],
-            current_price=data['current_price'],
             target_price=target_price,
             email=email
         )
         db.session.add(product)
+        db.session.commit()
+        invalidate_products_cache()
 
-        # Add initial price history
-        price_history = PriceHistory(
-            product_id=product.id,
-            price=data['current_price']
+        scrape_executor.submit(
+            _scrape_new_product,
+            current_app._get_current_object(),
+            product.id,
+            amazon_url
         )
-        db.session.add(price_history)
-        db.session.commit()
 
-        return jsonify(product.to_dict()), 201
+        return jsonify(product.to_dict()), 202
 
     except Exception as e:
         logger.error(f"Error adding product: {str(e)}")
@@ -66,8 +134,16 @@ def add_product():
 def get_products():
     """Get all tracked products"""
     try:
-        products = Product.query.all()
-        return jsonify([product.to_dict() for product in products])
+        body = get_cached_products_response('products')
+        if body is None:
+            # Select plain columns so no Product objects are built just to be serialized
+            rows = db.session.execute(db.select(*Product.dict_columns())).mappings().all()
+            body = orjson.dumps([dict(row) for row in rows])
+            # Invalidation only reaches this process, so never let other workers hold on to a
+            # product whose first scrape (title still null) is in flight
+            if all(row['title'] is not None for row in rows):
+                cache_products_response('products', body)
+        return json_bytes_response(body)
 
     except Exception as e:
         logger.error(f"Error fetching products: {str(e)}")
@@ -77,8 +153,14 @@ def get_products():
 def get_product(product_id):
     """Get details of a specific product"""
     try:
-        product = Product.query.get_or_404(product_id)
-        return jsonify(product.to_dict())
+        cache_key = ('product', product_id)
+        body = get_cached_products_response(cache_key)
+        if body is None:
+            product = Product.query.get_or_404(product_id)
+            body = orjson.dumps(product.to_dict())
+            if product.title is not None:
+                cache_products_response(cache_key, body)
+        return json_bytes_response(body)
 
     except Exception as e:
         logger.error(f"Error fetching product {product_id}: {str(e)}")
@@ -88,8 +170,29 @@ def get_product(product_id):
 def get_price_history(product_id):
     """Get price history for a specific product"""
     try:
-        history = PriceHistory.query.filter_by(product_id=product_id).order_by(PriceHistory.timestamp.desc()).all()
-        return jsonify([record.to_dict() for record in history])
+        # Clamp to [1, MAX]: SQLite reads a negative LIMIT as unlimited and Postgres rejects it
+        limit = max(1, min(request.args.get('limit', DEFAULT_HISTORY_LIMIT, type=int), MAX_HISTORY_LIMIT))
+        try:
+            since = request.args.get('since')
+            since = datetime.fromisoformat(since) if since else datetime.utcnow() - timedelta(days=DEFAULT_HISTORY_DAYS)
+            before = request.args.get('before')
+            before = datetime.fromisoformat(before) if before else None
+        except ValueError:
+            return jsonify({'error': 'since and before must be ISO 8601 timestamps'}), 400
+
+        query = PriceHistory.query.filter(
+            PriceHistory.product_id == product_id,
+            PriceHistory.timestamp >= since
+        )
+        # Keyset pagination: pass the oldest timestamp of the previous page as ?before=
+        if before is not None:
+            query = query.filter(PriceHistory.timestamp < before)
+
+        # Fetch plain column tuples; orjson serializes the timestamps natively
+        rows = query.with_entities(
+            PriceHistory.id, PriceHistory.product_id, PriceHistory.price, PriceHistory.timestamp
+        ).order_by(PriceHistory.timestamp.desc()).limit(limit).all()
+        return ojsonify([row._asdict() for row in rows])
 
     except Exception as e:
         logger.error(f"Error fetching price history for product {product_id}: {str(e)}")
@@ -99,9 +202,11 @@ def get_price_history(product_id):
 def delete_product(product_id):
     """Delete a tracked product"""
     try:
-        product = Product.query.get_or_404(product_id)
+        # The history cascade must be loaded explicitly since the relationship is lazy='raise'
+        product = Product.query.options(selectinload(Product.price_history)).get_or_404(product_id)
         db.session.delete(product)
         db.session.commit()
+        invalidate_products_cache()
         return '', 204
 
     except Exception as e:
@@ -1,11 +1,14 @@
 import os
 import logging
-import requests
 import json
+import orjson
 import re
 import uuid
+import functools
 from datetime import datetime
 from services.scraper import scrape_product
+from services.http_client import SESSION
+from services.cache import get_cached_comparisons, cache_comparisons
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -18,14 +21,44 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
-def extract_product_metadata(url):
+# (connect, read) seconds for AI provider calls, so a stalled provider can't pin a request or scheduler thread
+AI_REQUEST_TIMEOUT = (5, 30)
+
+# Patterns used per product name / per AI match, compiled once at import
+_COLOR_RE = re.compile(r'\b(Black|White|Blue|Red|Green|Yellow|Purple|Pink|Gold|Silver|Gray|Grey)\b', re.IGNORECASE)
+# Capacity not followed by "RAM"; re is leftmost-first, so "8GB RAM, 128GB" would otherwise report 8GB as storage
+_STORAGE_RE = re.compile(r'\b(\d+)\s*(GB|TB|MB)\b(?!\s*RAM\b)', re.IGNORECASE)
+_RAM_RE = re.compile(r'\b(\d+)\s*GB\s*RAM\b', re.IGNORECASE)
+_RUPEE_PRICE_RE = re.compile(r'₹\s*([\d,]+)')
+
+# Common filler words skipped when extracting title keywords
+_STOPWORDS = frozenset(['the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'in', 'with', 'for', 'on', 'at', 'to', 'from'])
+# Unit fragments that mark a word as a product specification
+_SPEC_TERMS = ('gb', 'tb', 'mb', 'inch', 'cm', 'mm', 'kg', 'liter', 'watt', 'volt', 'hz')
+# Matches a digit or any spec term, replacing separate digit and per-term substring passes
+_SPEC_WORD_RE = re.compile(r'\d|' + '|'.join(_SPEC_TERMS))
+
+# Fallback category keywords, in priority order
+_CATEGORY_KEYWORDS = {
+    'Electronics': ('phone', 'laptop', 'computer', 'tv', 'headphone', 'camera', 'tablet'),
+    'Fashion': ('shirt', 'pant', 'dress', 'shoe', 'clothing', 'apparel', 'fashion'),
+    'Home & Kitchen': ('kitchen', 'furniture', 'bed', 'sofa', 'chair', 'table', 'appliance'),
+    'Health & Personal Care': ('health', 'vitamin', 'supplement', 'protein', 'personal care'),
+    'Beauty': ('beauty', 'makeup', 'cosmetic', 'skin care', 'hair care'),
+    'Grocery': ('food', 'grocery', 'snack', 'beverage', 'drink'),
+    'Sports & Fitness': ('sport', 'fitness', 'exercise', 'gym', 'yoga', 'workout')
+}
+
+def extract_product_metadata(url, product_data=None):
     """
     Extract product metadata using AI or scraping
     Returns a dictionary with product details
+    Pass product_data when the page was already scraped to avoid fetching it again
     """
     try:
-        # First try to scrape the product directly
-        product_data = scrape_product(url)
+        # First try to scrape the product directly, unless the caller already did
+        if product_data is None:
+            product_data = scrape_product(url)
         
         if not product_data or 'name' not in product_data:
             logger.warning(f"Failed to scrape product data from {url}")
@@ -78,8 +111,13 @@ def extract_keywords_from_title(title, brand=None, model=None):
     Returns:
         list: A list of important keywords
     """
+    return list(_extract_keywords(title, brand, model))
+
+@functools.lru_cache(maxsize=4096)
+def _extract_keywords(title, brand, model):
+    """Cached keyword extraction; returns a tuple so cached results can't be mutated by callers"""
     if not title:
-        return []
+        return ()
         
     # If we have brand and model, make sure they're included
     important_terms = []
@@ -91,23 +129,14 @@ def extract_keywords_from_title(title, brand=None, model=None):
     # Split the title into words
     words = title.lower().split()
     
-    # Filter out common filler words
-    stopwords = ['the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'in', 'with', 'for', 'on', 'at', 'to', 'from']
-    
     # Extract words that might be important (longer words, numbers, etc.)
     for word in words:
         # Skip short words and stopwords
-        if len(word) <= 2 or word in stopwords:
-            continue
-            
-        # Check if it's a number or contains digits (could be important specs)
-        if word.isdigit() or any(c.isdigit() for c in word):
-            important_terms.append(word)
+        if len(word) <= 2 or word in _STOPWORDS:
             continue
             
-        # Check if it's an important specification term
-        spec_terms = ['gb', 'tb', 'mb', 'inch', 'cm', 'mm', 'kg', 'liter', 'watt', 'volt', 'hz']
-        if any(term in word for term in spec_terms):
+        # Numbers, words containing digits and specification terms, in one scan of the word
+        if _SPEC_WORD_RE.search(word):
             important_terms.append(word)
             continue
             
@@ -119,7 +148,7 @@ def extract_keywords_from_title(title, brand=None, model=None):
     if title.lower() not in important_terms:
         important_terms.append(title.lower())
         
-    return important_terms
+    return tuple(important_terms)
 
 def enhance_metadata_with_gemini(product_data):
     """
@@ -173,10 +202,10 @@ def enhance_metadata_with_gemini(product_data):
             }
         }
         
-        response = requests.post(api_url, headers=headers, json=data)
+        response = SESSION.post(api_url, headers=headers, json=data, timeout=AI_REQUEST_TIMEOUT)
         response.raise_for_status()
         
-        result = response.json()
+        result = orjson.loads(response.content)
         
         # Extract content from Gemini response (different structure than OpenAI/Groq)
         if 'candidates' in result and len(result['candidates']) > 0:
@@ -273,10 +302,10 @@ def enhance_metadata_with_groq(product_data):
         }
         
         # Groq's API is compatible with OpenAI's API
-        response = requests.post('https://api.groq.com/openai/v1/chat/completions', headers=headers, json=data)
+        response = SESSION.post('https://api.groq.com/openai/v1/chat/completions', headers=headers, json=data, timeout=AI_REQUEST_TIMEOUT)
         response.raise_for_status()
         
-        result = response.json()
+        result = orjson.loads(response.content)
         ai_response = result['choices'][0]['message']['content']
         
         # Validate AI response before parsing
@@ -355,21 +384,9 @@ def guess_product_category(name, description):
     Guess a product category based on name and description
     Used as fallback when AI categorization fails
     """
-    name_lower = (name or '').lower()
-    desc_lower = (description or '').lower()
-    combined = name_lower + ' ' + desc_lower
-    
-    category_keywords = {
-        'Electronics': ['phone', 'laptop', 'computer', 'tv', 'headphone', 'camera', 'tablet'],
-        'Fashion': ['shirt', 'pant', 'dress', 'shoe', 'clothing', 'apparel', 'fashion'],
-        'Home & Kitchen': ['kitchen', 'furniture', 'bed', 'sofa', 'chair', 'table', 'appliance'],
-        'Health & Personal Care': ['health', 'vitamin', 'supplement', 'protein', 'personal care'],
-        'Beauty': ['beauty', 'makeup', 'cosmetic', 'skin care', 'hair care'],
-        'Grocery': ['food', 'grocery', 'snack', 'beverage', 'drink'],
-        'Sports & Fitness': ['sport', 'fitness', 'exercise', 'gym', 'yoga', 'workout']
-    }
+    combined = (name or '').lower() + ' ' + (description or '').lower()
     
-    for category, keywords in category_keywords.items():
+    for category, keywords in _CATEGORY_KEYWORDS.items():
         if any(keyword in combined for keyword in keywords):
             return category
     
@@ -412,10 +429,10 @@ def enhance_metadata_with_openai(product_data):
             'max_tokens': 500
         }
         
-        response = requests.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data)
+        response = SESSION.post('https://api.openai.com/v1/chat/completions', headers=headers, json=data, timeout=AI_REQUEST_TIMEOUT)
         response.raise_for_status()
         
-        result = response.json()
+        result = orjson.loads(response.content)
         ai_response = result['choices'][0]['message']['content']
         
         # Try to parse the JSON response
@@ -479,13 +496,9 @@ def is_genuine_match(match_title, original_title, brand, model, keywords, featur
             return False, 0.1
         
     # Calculate keyword matches
-    matched_keywords = 0
     total_keywords = len(keywords) if keywords else 1
+    matched_keywords = sum(1 for keyword in keywords if keyword in match_title)
     
-    for keyword in keywords:
-        if keyword in match_title:
-            matched_keywords += 1
-            
     # Weight keyword matches
     keyword_match_percentage = matched_keywords / total_keywords
     confidence += keyword_match_percentage * 0.3
@@ -494,11 +507,9 @@ def is_genuine_match(match_title, original_title, brand, model, keywords, featur
     if features and isinstance(features, list):
         feature_match_count = 0
         for feature in features:
-            feature_keywords = extract_keywords_from_title(feature)
-            feature_match_score = 0
-            for kw in feature_keywords:
-                if kw in match_title:
-                    feature_match_score += 1
+            # Cached tuple; no per-candidate list copy
+            feature_keywords = _extract_keywords(feature, None, None)
+            feature_match_score = sum(1 for kw in feature_keywords if kw in match_title)
             
             if feature_match_score / max(1, len(feature_keywords)) > 0.5:
                 feature_match_count += 1
@@ -589,7 +600,7 @@ def process_ai_product_matches(ai_data, product_name, product_brand, product_mod
         # Process price with proper error handling
         if price_str:
             # Extract numeric price value using regex
-            price_match = re.search(r'₹\s*([\d,]+)', price_str)
+            price_match = _RUPEE_PRICE_RE.search(price_str)
             if price_match:
                 try:
                     # Convert to numeric format for frontend
@@ -604,6 +615,32 @@ def process_ai_product_matches(ai_data, product_name, product_brand, product_mod
     return comparisons
 
 def search_other_platforms(metadata):
+    """
+    Find the product on other platforms, reusing verified AI matches for the same
+    product for up to an hour
+    """
+    if not metadata or 'name' not in metadata:
+        return _search_other_platforms(metadata)
+    
+    features = metadata.get('key_features') or ()
+    cache_key = (
+        (metadata.get('name') or '').strip(),
+        (metadata.get('brand') or '').strip(),
+        (metadata.get('model') or '').strip(),
+        tuple(str(feature) for feature in features) if isinstance(features, (list, tuple)) else str(features),
+        metadata.get('price')
+    )
+    cached = get_cached_comparisons(cache_key)
+    if cached is not None:
+        return [dict(entry) for entry in cached]
+    
+    comparisons = _search_other_platforms(metadata)
+    # Only AI-verified results are worth keeping; the plain search-URL fallback is cheap to rebuild
+    if any(entry.get('is_genuine_match') for entry in comparisons):
+        cache_comparisons(cache_key, [dict(entry) for entry in comparisons])
+    return comparisons
+
+def _search_other_platforms(metadata):
     """
     Act as a smart shopping assistant to find the same or exact equivalent product
     on other Indian e-commerce platforms.
@@ -619,9 +656,9 @@ def search_other_platforms(metadata):
     platforms = ['Flipkart', 'Snapdeal', 'Reliance Digital', 'Tata Cliq', 'Croma']
     
     # Extract product details for search context
-    product_name = metadata.get('name', '').strip()
-    product_brand = metadata.get('brand', '').strip()
-    product_model = metadata.get('model', '').strip()
+    product_name = (metadata.get('name') or '').strip()
+    product_brand = (metadata.get('brand') or '').strip()
+    product_model = (metadata.get('model') or '').strip()
     product_features = metadata.get('key_features', [])
     product_price = metadata.get('price')
     
@@ -677,17 +714,17 @@ def search_other_platforms(metadata):
         critical_identifiers.append(f"Model: {product_model}")
     
     # Extract color, capacity, size if mentioned in product name
-    color_match = re.search(r'\b(Black|White|Blue|Red|Green|Yellow|Purple|Pink|Gold|Silver|Gray|Grey)\b', product_name, re.IGNORECASE)
+    color_match = _COLOR_RE.search(product_name)
     if color_match:
         critical_identifiers.append(f"Color: {color_match.group(0)}")
     
     # Look for storage capacity
-    storage_match = re.search(r'\b(\d+)\s*(GB|TB|MB)\b', product_name, re.IGNORECASE)
+    storage_match = _STORAGE_RE.search(product_name)
     if storage_match:
         critical_identifiers.append(f"Storage: {storage_match.group(0)}")
     
     # Look for RAM
-    ram_match = re.search(r'\b(\d+)\s*GB\s*RAM\b', product_name, re.IGNORECASE)
+    ram_match = _RAM_RE.search(product_name)
     if ram_match:
         critical_identifiers.append(f"RAM: {ram_match.group(0)}")
     
@@ -783,10 +820,10 @@ def search_other_platforms(metadata):
                         }
                     }
                     
-                    response = requests.post(api_url, headers=headers, json=data)
+                    response = SESSION.post(api_url, headers=headers, json=data, timeout=AI_REQUEST_TIMEOUT)
                     response.raise_for_status()
                     
-                    result = response.json()
+                    result = orjson.loads(response.content)
                     
                     # Extract content from Gemini response
                     if 'candidates' in result and len(result['candidates']) > 0:
@@ -872,10 +909,10 @@ def search_other_platforms(metadata):
                 'response_format': {'type': 'json_object'}
             }
             
-            response = requests.post(api_endpoint, headers=headers, json=data)
+            response = SESSION.post(api_endpoint, headers=headers, json=data, timeout=AI_REQUEST_TIMEOUT)
             response.raise_for_status()
             
-            result = response.json()
+            result = orjson.loads(response.content)
             ai_response = result['choices'][0]['message']['content']
             
             
@@ -944,7 +981,7 @@ def search_other_platforms(metadata):
                     # Process price with proper error handling
                     if price_str:
                         # Extract numeric price value using regex
-                        price_match = re.search(r'₹\s*([\d,]+)', price_str)
+                        price_match = _RUPEE_PRICE_RE.search(price_str)
                         if price_match:
                             try:
                                 # Convert to numeric format for frontend
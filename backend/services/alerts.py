@@ -1,7 +1,7 @@
 import asyncio
 import logging
-from services.database import get_untriggered_alerts, mark_alert_triggered, get_product_by_id
-from services.email_service import send_price_alert_email
+from services.database import get_untriggered_alerts, mark_alerts_triggered, get_product_by_id
+from services.email_service import send_price_alert_emails_batch
 
 logger = logging.getLogger(__name__)
 
@@ -22,18 +22,20 @@ async def check_and_trigger_alerts(product_id, current_price):
         
         logger.info(f"Found {len(alerts)} alerts to trigger for product {product_id}")
         
-        for alert in alerts:
-            try:
-                # Send email notification
-                email_sent = await send_price_alert_email(alert, product, current_price)
-                
-                if email_sent:
-                    # Mark alert as triggered
-                    await mark_alert_triggered(alert['id'])
-                    logger.info(f"Triggered alert {alert['id']} for product {product_id}")
-                else:
-                    logger.error(f"Failed to send email for alert {alert['id']}")
-            except Exception as e:
-                logger.error(f"Error triggering alert {alert['id']}: {str(e)}")
+        # Send all emails for this product over one SMTP connection
+        results = await send_price_alert_emails_batch(
+            [(alert, product, current_price) for alert in alerts]
+        )
+        
+        triggered_ids = []
+        for alert, email_sent in zip(alerts, results):
+            if email_sent:
+                triggered_ids.append(alert['id'])
+                logger.info(f"Triggered alert {alert['id']} for product {product_id}")
+            else:
+                logger.error(f"Failed to send email for alert {alert['id']}")
+        
+        # Mark every sent alert as triggered in one transaction
+        await mark_alerts_triggered(triggered_ids)
     except Exception as e:
         logger.error(f"Error checking alerts for product {product_id}: {str(e)}")
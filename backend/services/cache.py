@@ -0,0 +1,59 @@
+import threading
+from cachetools import TTLCache
+
+# Serialized JSON for the product read endpoints. Product data only changes on
+# writes and scheduler ticks, so dashboards polling every few seconds can share
+# one DB hit per TTL window.
+PRODUCTS_CACHE_TTL = 30  # seconds
+
+_products_cache = TTLCache(maxsize=1024, ttl=PRODUCTS_CACHE_TTL)
+_products_cache_lock = threading.Lock()  # TTLCache is not thread-safe
+
+def get_cached_products_response(key):
+    """Return cached JSON bytes for key, or None"""
+    with _products_cache_lock:
+        return _products_cache.get(key)
+
+def cache_products_response(key, body):
+    """Store JSON bytes for key"""
+    with _products_cache_lock:
+        _products_cache[key] = body
+
+def invalidate_products_cache():
+    """Drop all cached product responses after product or price writes"""
+    with _products_cache_lock:
+        _products_cache.clear()
+
+# Cross-platform comparisons for a product. Each one costs an LLM round trip
+# and the listings it describes move on the order of hours.
+COMPARISONS_CACHE_TTL = 3600  # seconds
+
+_comparisons_cache = TTLCache(maxsize=512, ttl=COMPARISONS_CACHE_TTL)
+_comparisons_cache_lock = threading.Lock()
+
+def get_cached_comparisons(key):
+    """Return cached comparison entries for key, or None"""
+    with _comparisons_cache_lock:
+        return _comparisons_cache.get(key)
+
+def cache_comparisons(key, comparisons):
+    """Store comparison entries for key"""
+    with _comparisons_cache_lock:
+        _comparisons_cache[key] = comparisons
+
+# Scraped Flipkart prices by URL. Comparison refreshes for several products can
+# point at the same listing within minutes of each other.
+FLIPKART_PRICE_CACHE_TTL = 300  # seconds
+
+_flipkart_price_cache = TTLCache(maxsize=512, ttl=FLIPKART_PRICE_CACHE_TTL)
+_flipkart_price_cache_lock = threading.Lock()
+
+def get_cached_flipkart_price(url):
+    """Return the cached price for a Flipkart URL, or None"""
+    with _flipkart_price_cache_lock:
+        return _flipkart_price_cache.get(url)
+
+def cache_flipkart_price(url, price):
+    """Store a scraped price for a Flipkart URL"""
+    with _flipkart_price_cache_lock:
+        _flipkart_price_cache[url] = price
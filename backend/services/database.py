@@ -3,13 +3,14 @@ import logging
 from dotenv import load_dotenv
 from flask import current_app
 from sqlalchemy.sql import text
-from datetime import datetime
+from sqlalchemy.orm import selectinload
 
 # Import models
 from models.db import db
 from models.product import Product
 from models.price_record import PriceRecord
 from models.price_alert import PriceAlert
+from services.cache import invalidate_products_cache
 
 # Load environment variables
 load_dotenv()
@@ -33,8 +34,11 @@ async def execute_query(query, params=None):
 async def get_all_products():
     """Get all products from database"""
     try:
-        products = Product.query.order_by(Product.created_at.desc()).all()
-        return [product.to_dict() for product in products]
+        # Serialize straight from a column select; to_dict touches no relationships
+        rows = db.session.execute(
+            db.select(*Product.dict_columns()).order_by(Product.created_at.desc())
+        ).mappings().all()
+        return [Product.row_to_dict(row) for row in rows]
     except Exception as e:
         logger.error(f"Error getting products: {str(e)}")
         raise
@@ -42,7 +46,7 @@ async def get_all_products():
 async def get_product_by_id(product_id):
     """Get a specific product by ID"""
     try:
-        product = Product.query.get(product_id)
+        product = db.session.get(Product, product_id)
         return product.to_dict() if product else None
     except Exception as e:
         logger.error(f"Error getting product {product_id}: {str(e)}")
@@ -94,11 +98,11 @@ async def insert_price_record(product_id, price):
 async def update_product_price(product_id, new_price):
     """Update product's current price"""
     try:
-        product = Product.query.get(product_id)
+        product = db.session.get(Product, product_id)
         if product:
-            product.current_price = new_price
-            product.updated_at = datetime.utcnow()
+            product.record_price(new_price)
             db.session.commit()
+            invalidate_products_cache()
             return product.to_dict()
         return None
     except Exception as e:
@@ -138,7 +142,7 @@ async def get_untriggered_alerts(product_id, current_price):
 async def mark_alert_triggered(alert_id):
     """Mark an alert as triggered"""
     try:
-        alert = PriceAlert.query.get(alert_id)
+        alert = db.session.get(PriceAlert, alert_id)
         if alert:
             alert.triggered = True
             db.session.commit()
@@ -147,10 +151,24 @@ async def mark_alert_triggered(alert_id):
         logger.error(f"Error marking alert as triggered: {str(e)}")
         raise
 
+async def mark_alerts_triggered(alert_ids):
+    """Mark several alerts as triggered with one UPDATE and a single commit"""
+    if not alert_ids:
+        return
+    try:
+        db.session.execute(
+            db.update(PriceAlert).where(PriceAlert.id.in_(alert_ids)).values(triggered=True)
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error marking alerts as triggered: {str(e)}")
+        raise
+
 async def delete_product_by_id(product_id):
     """Delete a product and all related records"""
     try:
-        product = Product.query.get(product_id)
+        product = db.session.get(Product, product_id, options=[selectinload(Product.price_history)])
         if product:
             name = product.name
             db.session.delete(product)
@@ -1,12 +1,19 @@
 import os
+import html
+import functools
 import smtplib
 import asyncio
 import socket
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import ssl
+import threading
+import atexit
+from email.message import EmailMessage
+from email.utils import formatdate
 import logging
+import random
 import time
 from datetime import datetime
+from string import Template
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -26,6 +33,18 @@ _smtp_connection_verified = False
 _smtp_last_attempt = 0
 _smtp_retry_interval = 300  # 5 minutes
 
+# Backoff between SMTP send retries: decorrelated jitter between the base and three times the last delay
+SMTP_RETRY_DELAY_BASE = 1  # seconds
+SMTP_RETRY_DELAY_MAX = 10  # seconds
+
+# Shared SMTP connection, reused across alert emails
+_smtp_server = None
+_smtp_lock = threading.Lock()
+
+# TLS context and local hostname are computed once instead of per connection
+_SSL_CONTEXT = ssl.create_default_context()
+_LOCAL_HOSTNAME = socket.getfqdn()
+
 def validate_smtp_config():
     """
     Check if SMTP configuration is valid
@@ -40,6 +59,62 @@ def validate_smtp_config():
     
     return True
 
+def connect_smtp(host, port, username, password, timeout=30):
+    """
+    Open an authenticated SMTP connection
+    Port 465 uses implicit TLS, which saves the extra EHLO round trip of STARTTLS
+    """
+    if int(port) == 465:
+        server = smtplib.SMTP_SSL(host, port, local_hostname=_LOCAL_HOSTNAME,
+                                  context=_SSL_CONTEXT, timeout=timeout)
+    else:
+        server = smtplib.SMTP(host, port, local_hostname=_LOCAL_HOSTNAME, timeout=timeout)
+        server.starttls(context=_SSL_CONTEXT)
+    server.login(username, password)
+    return server
+
+def get_smtp():
+    """
+    Return the shared SMTP connection, opening it on first use
+    A stale connection is detected with NOOP and replaced
+    Callers must hold _smtp_lock
+    """
+    global _smtp_server
+    
+    if _smtp_server is not None:
+        try:
+            _smtp_server.noop()
+            return _smtp_server
+        except (smtplib.SMTPException, socket.error):
+            logger.info("Shared SMTP connection went stale, reconnecting")
+            _smtp_server = None
+    
+    _smtp_server = connect_smtp(SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD)
+    return _smtp_server
+
+def close_smtp():
+    """Close the shared SMTP connection if it is open"""
+    global _smtp_server
+    
+    if _smtp_server is None:
+        return
+    try:
+        _smtp_server.quit()
+    except (smtplib.SMTPException, socket.error):
+        pass
+    finally:
+        _smtp_server = None
+
+atexit.register(close_smtp)
+
+def discard_smtp():
+    """
+    Forget the shared SMTP connection without sending QUIT
+    For forked worker processes, whose copy of the socket belongs to the parent
+    """
+    global _smtp_server
+    _smtp_server = None
+
 def test_smtp_connection():
     """
     Test SMTP connection and credentials
@@ -60,16 +135,13 @@ def test_smtp_connection():
     logger.info(f"Testing SMTP connection to {SMTP_SERVER}:{SMTP_PORT}")
     
     try:
-        # First check if server is reachable
-        socket.create_connection((SMTP_SERVER, SMTP_PORT), timeout=10)
-        
-        # Then test SMTP authentication
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            logger.info("SMTP connection test successful")
-            _smtp_connection_verified = True
-            return True
+        # Opening the shared connection tests reachability and authentication,
+        # and leaves it ready for the first alert
+        with _smtp_lock:
+            get_smtp()
+        logger.info("SMTP connection test successful")
+        _smtp_connection_verified = True
+        return True
     except socket.error as e:
         logger.error(f"SMTP server unreachable: {str(e)}")
         _smtp_connection_verified = False
@@ -87,6 +159,180 @@ def test_smtp_connection():
         _smtp_connection_verified = False
         return False
 
+# Static price alert email body; only the $-placeholders change per alert
+_PRICE_ALERT_HTML_TEMPLATE = Template("""
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }
+        .container { max-width: 600px; margin: 0 auto; background-color: #ffffff; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px 20px; text-align: center; }
+        .header h1 { margin: 0; font-size: 28px; font-weight: 300; }
+        .content { padding: 30px 20px; }
+        .product-card { background-color: #f8f9fa; border-radius: 8px; padding: 20px; margin: 20px 0; border-left: 4px solid #667eea; }
+        .product-name { font-size: 18px; font-weight: 600; color: #2c3e50; margin-bottom: 10px; }
+        .price-info { display: flex; justify-content: space-between; align-items: center; margin: 15px 0; }
+        .current-price { font-size: 32px; color: #27ae60; font-weight: bold; }
+        .target-price { font-size: 16px; color: #7f8c8d; }
+        .savings { background-color: #e8f5e8; color: #27ae60; padding: 8px 16px; border-radius: 20px; font-weight: 600; }
+        .cta-button { display: inline-block; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; margin: 20px 0; font-weight: 600; text-align: center; }
+        .cta-button:hover { opacity: 0.9; }
+        .footer { background-color: #f8f9fa; padding: 20px; text-align: center; border-top: 1px solid #e9ecef; }
+        .footer p { margin: 5px 0; font-size: 12px; color: #6c757d; }
+        .emoji { font-size: 24px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div class="emoji">🎉</div>
+            <h1>Price Drop Alert!</h1>
+            <p>Your target price has been reached</p>
+        </div>
+        <div class="content">
+            <p>Great news! The price of a product you're tracking has dropped below your target price.</p>
+            
+            <div class="product-card">
+                <div class="product-name">$name</div>
+                <div class="price-info">
+                    <div>
+                        <div class="current-price">$currency $current_price</div>
+                        <div class="target-price">Target: $currency $target_price</div>
+                    </div>
+                    <div class="savings">
+                        Save $currency $savings
+                    </div>
+                </div>
+            </div>
+            
+            <p>Don't miss this opportunity to save money! Click the button below to view the product.</p>
+            
+            <div style="text-align: center;">
+                <a href="$url" class="cta-button">🛒 View Product Now</a>
+            </div>
+            
+            <p style="margin-top: 30px; font-size: 14px; color: #7f8c8d;">
+                <strong>💡 Pro Tip:</strong> Prices can change quickly. We recommend purchasing soon if you're interested!
+            </p>
+        </div>
+        <div class="footer">
+            <p><strong>PricePulse</strong> - Your Smart Price Tracking Assistant</p>
+            <p>This is an automated message. Please do not reply to this email.</p>
+            <p>© 2024 PricePulse. All rights reserved.</p>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+# Plain text alternative for the price alert email
+_PRICE_ALERT_TEXT_TEMPLATE = Template("""
+PRICE DROP ALERT!
+
+Great news! The price of $name has dropped below your target price.
+
+Current Price: $currency $current_price
+Your Target: $currency $target_price
+You Save: $currency $savings
+
+View the product here: $url
+
+Prices can change quickly. We recommend purchasing soon if you're interested!
+
+-- 
+PricePulse - Your Smart Price Tracking Assistant
+""")
+
+@functools.lru_cache(maxsize=256)
+def _render_price_alert_html(name, url, currency, target_price, current_price):
+    """Render the price alert HTML body; identical alerts (e.g. retries) are served from cache"""
+    return _PRICE_ALERT_HTML_TEMPLATE.substitute(
+        name=html.escape(name),
+        url=html.escape(url, quote=True),
+        currency=html.escape(currency),
+        current_price=f"{current_price:.2f}",
+        target_price=f"{target_price:.2f}",
+        savings=f"{(target_price - current_price):.2f}"
+    )
+
+def _build_price_alert_message(alert, product, current_price):
+    """Build the email message for a single price alert"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    logger.info(f"Preparing price alert email to {alert['email']} at {timestamp}")
+    
+    currency = product.get('currency', 'USD')
+    
+    # Create message
+    msg = EmailMessage()
+    msg['Subject'] = f"🚨 Price Drop Alert: {product['name']}"
+    msg['From'] = SENDER_EMAIL
+    msg['To'] = alert['email']
+    msg['Date'] = formatdate(localtime=True)
+    msg['X-PricePulse-AlertID'] = str(alert.get('id', 0))
+    
+    # Plain text body with the HTML version as the preferred alternative
+    msg.set_content(_PRICE_ALERT_TEXT_TEMPLATE.substitute(
+        name=product['name'],
+        url=product.get('url', ''),
+        currency=currency,
+        current_price=f"{current_price:.2f}",
+        target_price=f"{alert['target_price']:.2f}",
+        savings=f"{(alert['target_price'] - current_price):.2f}"
+    ))
+    msg.add_alternative(_render_price_alert_html(
+        product['name'],
+        product['url'],
+        currency,
+        alert['target_price'],
+        current_price
+    ), subtype='html')
+    return msg
+
+def _send_message(msg, to_email):
+    """
+    Send a message over the shared SMTP connection with retries
+    Returns True if the message was accepted by the server
+    """
+    retry_count = 0
+    max_retries = 3
+    retry_delay = SMTP_RETRY_DELAY_BASE
+    
+    def backoff():
+        nonlocal retry_delay
+        retry_delay = min(SMTP_RETRY_DELAY_MAX, random.uniform(SMTP_RETRY_DELAY_BASE, retry_delay * 3))
+        time.sleep(retry_delay)
+    
+    while retry_count < max_retries:
+        try:
+            with _smtp_lock:
+                get_smtp().send_message(msg)
+            logger.info(f"Email sent successfully to {to_email}")
+            return True
+        except smtplib.SMTPAuthenticationError:
+            logger.error("SMTP authentication failed - check username and password")
+            return False  # Don't retry auth failures
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.error) as e:
+            logger.warning(f"SMTP connection error (attempt {retry_count+1}/{max_retries}): {str(e)}")
+            with _smtp_lock:
+                close_smtp()
+            retry_count += 1
+            # The shared connection usually just idled out, so the first reconnect goes straight away
+            stale_connection = retry_count == 1 and isinstance(e, smtplib.SMTPServerDisconnected)
+            if retry_count < max_retries and not stale_connection:
+                backoff()
+        except smtplib.SMTPException as e:
+            logger.error(f"SMTP error: {str(e)}")
+            retry_count += 1
+            if retry_count < max_retries:
+                backoff()
+        except Exception as e:
+            logger.error(f"Unexpected error sending email: {str(e)}")
+            return False
+    
+    logger.error(f"Failed to send email after {max_retries} attempts")
+    return False
+
 async def send_price_alert_email(alert, product, current_price):
     """
     Send a price alert email notification
@@ -102,148 +348,11 @@ async def send_price_alert_email(alert, product, current_price):
         return False
     
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        logger.info(f"Preparing price alert email to {alert['email']} at {timestamp}")
-        
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"🚨 Price Drop Alert: {product['name']}"
-        msg['From'] = SENDER_EMAIL
-        msg['To'] = alert['email']
-        msg['Date'] = timestamp
-        msg['X-PricePulse-AlertID'] = str(alert.get('id', 0))
-        
-        # Create HTML content
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; }}
-                .container {{ max-width: 600px; margin: 0 auto; background-color: #ffffff; }}
-                .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px 20px; text-align: center; }}
-                .header h1 {{ margin: 0; font-size: 28px; font-weight: 300; }}
-                .content {{ padding: 30px 20px; }}
-                .product-card {{ background-color: #f8f9fa; border-radius: 8px; padding: 20px; margin: 20px 0; border-left: 4px solid #667eea; }}
-                .product-name {{ font-size: 18px; font-weight: 600; color: #2c3e50; margin-bottom: 10px; }}
-                .price-info {{ display: flex; justify-content: space-between; align-items: center; margin: 15px 0; }}
-                .current-price {{ font-size: 32px; color: #27ae60; font-weight: bold; }}
-                .target-price {{ font-size: 16px; color: #7f8c8d; }}
-                .savings {{ background-color: #e8f5e8; color: #27ae60; padding: 8px 16px; border-radius: 20px; font-weight: 600; }}
-                .cta-button {{ display: inline-block; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; margin: 20px 0; font-weight: 600; text-align: center; }}
-                .cta-button:hover {{ opacity: 0.9; }}
-                .footer {{ background-color: #f8f9fa; padding: 20px; text-align: center; border-top: 1px solid #e9ecef; }}
-                .footer p {{ margin: 5px 0; font-size: 12px; color: #6c757d; }}
-                .emoji {{ font-size: 24px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <div class="emoji">🎉</div>
-                    <h1>Price Drop Alert!</h1>
-                    <p>Your target price has been reached</p>
-                </div>
-                <div class="content">
-                    <p>Great news! The price of a product you're tracking has dropped below your target price.</p>
-                    
-                    <div class="product-card">
-                        <div class="product-name">{product['name']}</div>
-                        <div class="price-info">
-                            <div>
-                                <div class="current-price">{product.get('currency', 'USD')} {current_price:.2f}</div>
-                                <div class="target-price">Target: {product.get('currency', 'USD')} {alert['target_price']:.2f}</div>
-                            </div>
-                            <div class="savings">
-                                Save {product.get('currency', 'USD')} {(alert['target_price'] - current_price):.2f}
-                            </div>
-                        </div>
-                    </div>
-                    
-                    <p>Don't miss this opportunity to save money! Click the button below to view the product.</p>
-                    
-                    <div style="text-align: center;">
-                        <a href="{product['url']}" class="cta-button">🛒 View Product Now</a>
-                    </div>
-                    
-                    <p style="margin-top: 30px; font-size: 14px; color: #7f8c8d;">
-                        <strong>💡 Pro Tip:</strong> Prices can change quickly. We recommend purchasing soon if you're interested!
-                    </p>
-                </div>
-                <div class="footer">
-                    <p><strong>PricePulse</strong> - Your Smart Price Tracking Assistant</p>
-                    <p>This is an automated message. Please do not reply to this email.</p>
-                    <p>© 2024 PricePulse. All rights reserved.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Attach HTML content
-        msg.attach(MIMEText(html_content, 'html'))
-        
-        # Add a plain text alternative
-        plain_text = f"""
-        PRICE DROP ALERT!
-        
-        Great news! The price of {product['name']} has dropped below your target price.
-        
-        Current Price: {product.get('currency', 'USD')} {current_price:.2f}
-        Your Target: {product.get('currency', 'USD')} {alert['target_price']:.2f}
-        You Save: {product.get('currency', 'USD')} {(alert['target_price'] - current_price):.2f}
-        
-        View the product here: {product.get('url', '')}
-        
-        Prices can change quickly. We recommend purchasing soon if you're interested!
-        
-        -- 
-        PricePulse - Your Smart Price Tracking Assistant
-        """
-        msg.attach(MIMEText(plain_text, 'plain'))
-        
-        # Send email in a separate thread to avoid blocking
-        def send_email():
-            retry_count = 0
-            max_retries = 3
-            retry_delay = 2  # seconds
-            
-            while retry_count < max_retries:
-                try:
-                    # Use with context to ensure proper cleanup
-                    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30) as server:
-                        server.ehlo()
-                        server.starttls()
-                        server.ehlo()
-                        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                        server.send_message(msg)
-                        logger.info(f"Email sent successfully to {alert['email']}")
-                        return True
-                except smtplib.SMTPAuthenticationError:
-                    logger.error("SMTP authentication failed - check username and password")
-                    return False  # Don't retry auth failures
-                except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.error) as e:
-                    logger.warning(f"SMTP connection error (attempt {retry_count+1}/{max_retries}): {str(e)}")
-                    retry_count += 1
-                    if retry_count < max_retries:
-                        time.sleep(retry_delay)
-                        retry_delay *= 2  # Exponential backoff
-                except smtplib.SMTPException as e:
-                    logger.error(f"SMTP error: {str(e)}")
-                    retry_count += 1
-                    if retry_count < max_retries:
-                        time.sleep(retry_delay)
-                        retry_delay *= 2
-                except Exception as e:
-                    logger.error(f"Unexpected error sending email: {str(e)}")
-                    return False
-            
-            logger.error(f"Failed to send email after {max_retries} attempts")
-            return False
+        msg = _build_price_alert_message(alert, product, current_price)
         
         # Run email sending in thread pool
         loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, send_email)
+        result = await loop.run_in_executor(None, _send_message, msg, alert['email'])
         
         if result:
             logger.info(f"Price alert email sent to {alert['email']} for product {product['id']}")
@@ -255,6 +364,36 @@ async def send_price_alert_email(alert, product, current_price):
         logger.error(f"Error sending price alert email: {str(e)}")
         return False
 
+async def send_price_alert_emails_batch(triples):
+    """
+    Send several price alert emails over one shared SMTP connection
+    Takes a list of (alert, product, current_price) triples and returns
+    a list of booleans in the same order
+    """
+    if not triples:
+        return []
+    
+    if not validate_smtp_config():
+        logger.warning("SMTP not configured correctly. Emails not sent.")
+        return [False] * len(triples)
+    
+    def send_all():
+        results = []
+        for alert, product, current_price in triples:
+            try:
+                msg = _build_price_alert_message(alert, product, current_price)
+                results.append(_send_message(msg, alert['email']))
+            except Exception as e:
+                # One bad alert must not abort the rest of the batch
+                logger.error(f"Error sending price alert email for alert {alert.get('id')}: {str(e)}")
+                results.append(False)
+        return results
+    
+    loop = asyncio.get_event_loop()
+    results = await loop.run_in_executor(None, send_all)
+    logger.info(f"Sent {sum(results)}/{len(triples)} price alert emails in batch")
+    return results
+
 class EmailService:
     def __init__(self, smtp_server, smtp_port, smtp_username, smtp_password):
         self.smtp_server = smtp_server
@@ -266,7 +405,7 @@ class EmailService:
         """Send a price alert email when a product's price drops below the target price"""
         try:
             # Create message
-            msg = MIMEMultipart()
+            msg = EmailMessage()
             msg['From'] = self.smtp_username
             msg['To'] = to_email
             msg['Subject'] = f"Price Alert: {product_title} has dropped below your target price!"
@@ -286,12 +425,10 @@ class EmailService:
             </html>
             """
 
-            msg.attach(MIMEText(body, 'html'))
+            msg.set_content(body, subtype='html')
 
             # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
+            with connect_smtp(self.smtp_server, self.smtp_port, self.smtp_username, self.smtp_password) as server:
                 server.send_message(msg)
 
             logger.info(f"Price alert email sent to {to_email} for product {product_title}")
@@ -304,7 +441,7 @@ class EmailService:
     def send_welcome_email(self, to_email, product_title):
         """Send a welcome email when a user starts tracking a product"""
         try:
-            msg = MIMEMultipart()
+            msg = EmailMessage()
             msg['From'] = self.smtp_username
             msg['To'] = to_email
             msg['Subject'] = f"Welcome to PricePulse - Tracking {product_title}"
@@ -320,11 +457,9 @@ class EmailService:
             </html>
             """
 
-            msg.attach(MIMEText(body, 'html'))
+            msg.set_content(body, subtype='html')
 
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
+            with connect_smtp(self.smtp_server, self.smtp_port, self.smtp_username, self.smtp_password) as server:
                 server.send_message(msg)
 
             logger.info(f"Welcome email sent to {to_email} for product {product_title}")
@@ -1,58 +1,183 @@
+import atexit
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 import logging
 import re
+import random
+from services.http_client import create_session
+from services.cache import get_cached_flipkart_price, cache_flipkart_price
 
 logger = logging.getLogger(__name__)
 
-def scrape_flipkart_price(url):
+# Desktop browser user agents, one picked per request
+_USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15',
+)
+
+# Sent with every Flipkart fetch; compression and keep-alive are negotiated by the session
+HEADERS = {
+    'User-Agent': _USER_AGENTS[0],
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Pooled session for Flipkart with HEADERS installed once; requests only override the user agent.
+# Kept apart from http_client.SESSION, which the AI provider calls share.
+FLIPKART_SESSION = create_session()
+FLIPKART_SESSION.headers.update(HEADERS)
+atexit.register(FLIPKART_SESSION.close)
+
+# Bodies are read incrementally and reading stops shortly after the price markup has arrived
+READ_CHUNK_BYTES = 16_384
+PRICE_MARKER_SLACK_BYTES = 4_096  # Read past the first price marker so the element's text is complete
+# Either price class name, found in one scan of each new chunk
+_PRICE_MARKER_RE = re.compile(rb'_30jeq3|_1Vfi6u')
+
+# Product JSON-LD script bodies, sliced from the raw bytes
+_JSON_LD_RE = re.compile(rb'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+
+# Flipkart's bot-check page; searched case-insensitively on the raw bytes, without decoding the body
+_CAPTCHA_RE = re.compile(rb'captcha', re.IGNORECASE)
+
+class _PriceChars(dict):
+    """
+    str.translate table keeping only ASCII digits and '.'.
+    Filled in on first sight of each character, so '₹' and other non-ASCII symbols are covered too.
+    """
+    def __missing__(self, codepoint):
+        keep = codepoint if chr(codepoint) in '0123456789.' else None
+        self[codepoint] = keep
+        return keep
+
+# Strips currency symbols, commas and whitespace from a scraped price in one C-level pass
+_PRICE_CHARS = _PriceChars()
+
+# Common selectors for Flipkart price - these might need adjustment based on current Flipkart HTML.
+# lexbor returns matches for the grouped selector in document order.
+_PRICE_SELECTOR = 'div._30jeq3, div._1Vfi6u, div._25b18c ._30jeq3'
+
+def _read_until_price(response):
+    """
+    Read the body in chunks, stopping a little after the first price marker.
+    Returns (content, stopped_early).
+    """
+    body = bytearray()
+    stop_at = None
+    for chunk in response.iter_content(READ_CHUNK_BYTES):
+        # Search only the new bytes, with overlap for a marker split across chunks
+        search_from = max(0, len(body) - 16)
+        body += chunk
+        if stop_at is None:
+            marker = _PRICE_MARKER_RE.search(body, search_from)
+            if marker:
+                stop_at = marker.start() + PRICE_MARKER_SLACK_BYTES
+        if stop_at is not None and len(body) >= stop_at:
+            return bytes(body), True
+    return bytes(body), False
+
+def _json_ld_price(content):
+    """Return the offer price from a schema.org Product JSON-LD block, or None"""
+    for block in _JSON_LD_RE.findall(content):
+        try:
+            data = orjson.loads(block)
+        except orjson.JSONDecodeError:
+            continue
+
+        # Flipkart emits a list of entities (Product, BreadcrumbList, ...) in one block
+        for item in data if isinstance(data, list) else (data,):
+            if not isinstance(item, dict) or item.get('@type') != 'Product':
+                continue
+            offers = item.get('offers') or {}
+            if isinstance(offers, list):
+                offers = offers[0] if offers else {}
+            if isinstance(offers, dict) and offers.get('price') is not None:
+                return offers['price']
+    return None
+
+def _find_price_text(content):
+    """
+    Return the price text from the page's JSON-LD, else the stripped text
+    of the first non-empty price element, or None
+    """
+    if not content:
+        return None
+
+    # One JSON parse is cheaper than building the tree and survives Flipkart's hashed class renames
+    price = _json_ld_price(content)
+    if price is not None:
+        return str(price)
+
+    tree = LexborHTMLParser(content)
+
+    for element in tree.css(_PRICE_SELECTOR):
+        # The price is the element's own text; only walk the subtree when it's nested deeper
+        text = element.text(deep=False) or element.text()
+        if text:
+            return text.strip()
+    return None
+
+def scrape_flipkart_price(url, session=FLIPKART_SESSION):
     """
     Scrape product price from a Flipkart URL.
     Returns the price as a float or None if scraping fails.
+    Successful prices are reused for a few minutes; failures are retried on the next call.
     """
-    try:
-        logger.info(f"Attempting to scrape Flipkart price from: {url}")
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
+    price = get_cached_flipkart_price(url)
+    if price is not None:
+        logger.debug("Using cached Flipkart price %s for URL: %s", price, url)
+        return price
 
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
+    price = _scrape_flipkart_price(url, session)
+    if price is not None:
+        cache_flipkart_price(url, price)
+    return price
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+def _scrape_flipkart_price(url, session):
+    """Fetch a Flipkart page and parse its price, or return None"""
+    try:
+        logger.info("Attempting to scrape Flipkart price from: %s", url)
 
-        # Common selectors for Flipkart price - these might need adjustment based on current Flipkart HTML
-        price_elements = soup.select('div._30jeq3, div._1Vfi6u, div._25b18c ._30jeq3')
+        # The pooled session reuses the TCP/TLS connection to flipkart.com across scrapes
+        response = session.get(url, headers={'User-Agent': random.choice(_USER_AGENTS)}, timeout=10, stream=True)
+        try:
+            response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
 
-        price_text = None
-        for element in price_elements:
-            if element.text:
-                price_text = element.text.strip()
-                break
+            content, stopped_early = _read_until_price(response)
+            price_text = _find_price_text(content)
+            if price_text is None and _CAPTCHA_RE.search(content):
+                # Checked only when the price is missing, since product pages may mention captcha in scripts
+                logger.warning("Flipkart served a captcha page for URL: %s", url)
+                return None
+            if price_text is None and stopped_early:
+                # Stopped early on a marker that wasn't the price element; fall back to the whole page
+                content += b''.join(response.iter_content(READ_CHUNK_BYTES))
+                price_text = _find_price_text(content)
+        finally:
+            response.close()
 
         if price_text:
             # Clean the price text (remove currency symbols, commas, etc.)
-            cleaned_price = re.sub(r'[^\d.]', '', price_text)
+            cleaned_price = price_text.translate(_PRICE_CHARS)
             try:
                 price = float(cleaned_price)
-                logger.info(f"Successfully scraped price {price} from Flipkart URL: {url}")
+                logger.info("Successfully scraped price %s from Flipkart URL: %s", price, url)
                 return price
             except ValueError:
-                logger.warning(f"Could not convert scraped price '{cleaned_price}' to float for URL: {url}")
+                logger.warning("Could not convert scraped price '%s' to float for URL: %s", cleaned_price, url)
                 return None
         else:
-            logger.warning(f"Could not find price element for Flipkart URL: {url}")
+            logger.warning("Could not find price element for Flipkart URL: %s", url)
             return None
 
     except requests.exceptions.RequestException as e:
-        logger.error(f"Request error scraping Flipkart price from {url}: {str(e)}")
+        logger.error("Request error scraping Flipkart price from %s: %s", url, e)
         return None
     except Exception as e:
-        logger.error(f"An unexpected error occurred while scraping Flipkart price from {url}: {str(e)}")
+        logger.error("An unexpected error occurred while scraping Flipkart price from %s: %s", url, e)
         return None
 
 # Example usage (for testing)
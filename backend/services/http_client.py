@@ -0,0 +1,57 @@
+import atexit
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def create_session():
+    """
+    Create a requests session with pooled keep-alive connections and
+    retries on transient upstream errors
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            # Only replay idempotent fetches; AI provider POSTs share this session and must not be resent
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            # Wait as long as a 429/503 asks before retrying instead of hammering the host
+            respect_retry_after_header=True
+        )
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# Shared session so repeated scrapes of the same host reuse TCP/TLS connections
+SESSION = create_session()
+atexit.register(SESSION.close)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `capacity` requests in a burst and
+    `rate` requests per second after that, shared by every caller
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Take one token, sleeping only as long as needed for it to refill"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Reserve the token now, even if that goes negative, so concurrent callers queue up behind it
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
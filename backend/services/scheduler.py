@@ -1,27 +1,32 @@
+import asyncio
 import logging
 import time
 import random
-import traceback
 import statistics
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, insert, update
 from models.db import db
 from models.product import Product
 from models.price_record import PriceRecord
 from models.price_alert import PriceAlert
-from services.scraper import scrape_product, AmazonScraper
+from services.scraper import scrape_product, scrape_products_bulk
 from services.flipkart_scraper import scrape_flipkart_price
-from services.email_service import send_price_alert_email
+from services.email_service import send_price_alert_emails_batch
 from services.ai_service import extract_product_metadata, search_other_platforms
 from datetime import datetime, timedelta
 from models.price_history import PriceHistory
+from services.cache import invalidate_products_cache
+from services.http_client import TokenBucket
 
 logger = logging.getLogger(__name__)
 
 # Constants for retry and rate limiting
 MAX_RETRIES = 3
 RETRY_DELAY_BASE = 2  # Base delay in seconds
-RATE_LIMIT_DELAY = 1.5  # Delay between requests to avoid rate limiting
+RATE_LIMIT_DELAY = 1.5  # Average delay between requests to avoid rate limiting
+
+# Paces AI lookups and comparison scrapes across all scheduler threads
+_request_bucket = TokenBucket(rate=1 / RATE_LIMIT_DELAY, capacity=2)
 
 # Constants for prioritization
 DEFAULT_UPDATE_INTERVAL = 24  # Default hours between updates for normal priority products
@@ -93,7 +98,7 @@ def calculate_update_priority(product, current_time=None):
                 # Not enough data points, give medium-low priority
                 priority_data['volatility_factor'] = 0.5
         except Exception as e:
-            logger.warning(f"Error calculating volatility for product {product.id}: {str(e)}")
+            logger.warning("Error calculating volatility for product %s: %s", product.id, e)
             priority_data['volatility_factor'] = 0.5  # Default to medium-low priority
         
         # 3. Active alerts factor
@@ -134,8 +139,8 @@ def calculate_update_priority(product, current_time=None):
         )
         
     except Exception as e:
-        logger.error(f"Error calculating priority for product {product.id}: {str(e)}")
-        logger.debug(traceback.format_exc())
+        logger.error("Error calculating priority for product %s: %s", product.id, e)
+        logger.debug("Error details", exc_info=True)
         # Default to medium priority based on time since update only
         priority_data['total_score'] = priority_data['time_factor']
     
@@ -148,43 +153,50 @@ def update_all_prices(app, max_products=MAX_PRODUCTS_PER_RUN):
     """
     with app.app_context():
         try:
-            # Get all products that need price updates
-            products = Product.query.limit(max_products).all()
-            logger.info(f"Updating prices for {len(products)} products")
+            # Only the columns the scrape needs, instead of full ORM objects
+            targets = db.session.query(Product.id, Product.amazon_url).limit(max_products).all()
+            # Release the connection so it isn't held for the whole (slow) fetch phase
+            db.session.close()
+            logger.info("Updating prices for %s products", len(targets))
+            
+            # Product and price history rows are collected and written in one batch at the end
+            product_rows = []
+            price_rows = []
             
-            scraper = AmazonScraper()
+            # Page fetches run concurrently; DB writes stay on this thread
+            results = scrape_products_bulk([amazon_url for _, amazon_url in targets])
             
-            for product in products:
+            for (product_id, _), (success, data) in zip(targets, results):
                 try:
-                    # Scrape current price
-                    success, data = scraper.scrape_product(product.amazon_url)
-                    
                     if success:
-                        # Update product price
-                        product.current_price = data['current_price']
-                        product.updated_at = datetime.utcnow()
+                        now = datetime.utcnow()
+                        product_rows.append(Product.price_update_row(product_id, data['current_price'], now))
                         
-                        # Add price to history
-                        price_history = PriceHistory(
-                            product_id=product.id,
-                            price=data['current_price']
-                        )
-                        db.session.add(price_history)
+                        # Queue price for the batched history insert
+                        price_rows.append({
+                            'product_id': product_id,
+                            'price': data['current_price'],
+                            'timestamp': now
+                        })
                         
-                        logger.info(f"Updated price for product {product.id}: {data['current_price']}")
+                        logger.info("Updated price for product %s: %s", product_id, data['current_price'])
                     else:
-                        logger.error(f"Failed to scrape price for product {product.id}: {data.get('error')}")
+                        logger.error("Failed to scrape price for product %s: %s", product_id, data.get('error'))
                 
                 except Exception as e:
-                    logger.error(f"Error updating price for product {product.id}: {str(e)}")
+                    logger.error("Error updating price for product %s: %s", product_id, e)
                     continue
             
-            # Commit all changes
+            # Update products and insert history rows in a single transaction
+            if product_rows:
+                db.session.execute(update(Product), product_rows)
+                db.session.execute(insert(PriceHistory), price_rows)
             db.session.commit()
+            invalidate_products_cache()
             logger.info("Completed price update cycle")
             
         except Exception as e:
-            logger.error(f"Error in price update cycle: {str(e)}")
+            logger.error("Error in price update cycle: %s", e)
             db.session.rollback()
 
 def update_product_with_retries(product):
@@ -197,35 +209,36 @@ def update_product_with_retries(product):
             # If not first attempt, add exponential backoff delay
             if attempt > 0:
                 delay = RETRY_DELAY_BASE * (2 ** (attempt - 1)) * (0.5 + random.random())
-                logger.info(f"Retry attempt {attempt+1} for product {product.id} after {delay:.2f}s delay")
+                logger.info("Retry attempt %s for product %s after %.2fs delay", attempt+1, product.id, delay)
                 time.sleep(delay)
             
             # Create a new transaction for this attempt
             update_product_prices_for_all_platforms(product)
             db.session.commit()
+            invalidate_products_cache()
             
-            logger.info(f"Successfully updated product {product.id} on attempt {attempt+1}")
+            logger.info("Successfully updated product %s on attempt %s", product.id, attempt+1)
             return True
             
         except SQLAlchemyError as db_err:
             # Database-related errors
-            logger.error(f"Database error updating product {product.id} (attempt {attempt+1}/{MAX_RETRIES}): {str(db_err)}")
+            logger.error("Database error updating product %s (attempt %s/%s): %s", product.id, attempt+1, MAX_RETRIES, db_err)
             db.session.rollback()
             
             # If this was the last attempt, mark as failed
             if attempt == MAX_RETRIES - 1:
-                logger.error(f"Failed to update product {product.id} after {MAX_RETRIES} attempts")
+                logger.error("Failed to update product %s after %s attempts", product.id, MAX_RETRIES)
                 return False
                 
         except Exception as e:
             # Other errors
-            logger.error(f"Error updating product {product.id} (attempt {attempt+1}/{MAX_RETRIES}): {str(e)}")
-            logger.debug(traceback.format_exc())
+            logger.error("Error updating product %s (attempt %s/%s): %s", product.id, attempt+1, MAX_RETRIES, e)
+            logger.debug("Error details", exc_info=True)
             db.session.rollback()
             
             # If this was the last attempt, mark as failed
             if attempt == MAX_RETRIES - 1:
-                logger.error(f"Failed to update product {product.id} after {MAX_RETRIES} attempts")
+                logger.error("Failed to update product %s after %s attempts", product.id, MAX_RETRIES)
                 return False
     
     return False  # Should never reach here, but just in case
@@ -235,13 +248,17 @@ def update_product_prices_for_all_platforms(product):
     """
     Update prices for a single product across its main platform and other found platforms.
     """
-    logger.info(f"Updating prices for product: {product.name} (ID: {product.id})")
+    logger.info("Updating prices for product: %s (ID: %s)", product.name, product.id)
     
     # Track whether we successfully updated at least one price source
     updated_any_price = False
     last_exception = None
+    
+    # Price records for every platform, written with one executemany INSERT at the end
+    price_rows = []
 
     # --- Update price for the main product URL (assuming Amazon) ---
+    product_data = None
     try:
         product_data = scrape_product(product.url)
         
@@ -251,49 +268,48 @@ def update_product_prices_for_all_platforms(product):
             
             # Validate price data
             if not isinstance(new_price, (int, float)) or new_price <= 0:
-                logger.warning(f"Invalid price data for product {product.id}: {new_price}. Skipping update.")
+                logger.warning("Invalid price data for product %s: %s. Skipping update.", product.id, new_price)
             else:
                 # Update product's current price and timestamp
-                product.current_price = new_price
-                product.updated_at = datetime.utcnow()
+                product.record_price(new_price)
                 
                 # Create new price record for the main platform (Amazon)
-                price_record = PriceRecord(
-                    product_id=product.id,
-                    price=new_price,
-                    platform='Amazon', # Explicitly set platform
-                    recorded_at=datetime.utcnow()
-                )
-                db.session.add(price_record)
-                logger.info(f"Updated Amazon price for product {product.id}: {new_price}")
+                price_rows.append({
+                    'product_id': product.id,
+                    'price': new_price,
+                    'platform': 'Amazon', # Explicitly set platform
+                    'timestamp': datetime.utcnow()
+                })
+                logger.info("Updated Amazon price for product %s: %s", product.id, new_price)
                 updated_any_price = True
                 
                 # Check for alerts only based on the main product price change
                 if old_price is not None and new_price < old_price:
-                    logger.info(f"Amazon price dropped for product {product.id}: {old_price} -> {new_price}. Checking alerts.")
+                    logger.info("Amazon price dropped for product %s: %s -> %s. Checking alerts.", product.id, old_price, new_price)
                     check_price_alerts(product, new_price)
                 elif old_price is None:
-                    logger.info(f"Initial Amazon price recorded for product {product.id}: {new_price}")
+                    logger.info("Initial Amazon price recorded for product %s: %s", product.id, new_price)
         else:
-            logger.warning(f"Failed to scrape price for main product URL {product.url} (ID: {product.id})")
+            logger.warning("Failed to scrape price for main product URL %s (ID: %s)", product.url, product.id)
             if product_data and 'scraping_failed' in product_data and product_data['scraping_failed']:
-                logger.warning(f"Scraper reported failure reason: {product_data.get('error', 'Unknown error')}")
+                logger.warning("Scraper reported failure reason: %s", product_data.get('error', 'Unknown error'))
     except Exception as e:
         last_exception = e
-        logger.error(f"Error updating main platform price for product {product.id}: {str(e)}")
-        logger.debug(traceback.format_exc())
+        logger.error("Error updating main platform price for product %s: %s", product.id, e)
+        logger.debug("Error details", exc_info=True)
 
     # --- Find and update prices for other platforms ---
     try:
         # Get product metadata to use for searching other platforms
-        metadata = extract_product_metadata(product.url)
+        # Reuse the page scraped above rather than fetching it a second time
+        metadata = extract_product_metadata(product.url, product_data or None)
         
         if metadata and 'name' in metadata:
             # Apply rate limiting before API call
-            time.sleep(random.uniform(0.5, RATE_LIMIT_DELAY))
+            _request_bucket.acquire()
             
             comparisons = search_other_platforms(metadata)
-            logger.info(f"Found {len(comparisons)} potential comparisons for product {product.id} on other platforms.")
+            logger.info("Found %s potential comparisons for product %s on other platforms.", len(comparisons), product.id)
             
             # Process each platform with individual error handling
             for comparison in comparisons:
@@ -304,47 +320,48 @@ def update_product_prices_for_all_platforms(product):
                     
                     # Only process if we have a platform name and URL, and it's not the main platform
                     if platform_name and platform_url and platform_name.lower() != 'amazon':
-                        # Apply rate limiting between scraping requests
-                        time.sleep(random.uniform(0.5, RATE_LIMIT_DELAY))
-                        
                         scraped_price = None
                         # Call the appropriate scraper based on platform_name
                         if platform_name == 'Flipkart':
+                            # Apply rate limiting between scraping requests
+                            _request_bucket.acquire()
                             scraped_price = scrape_flipkart_price(platform_url)
                         # Add elif for other platforms as scrapers are implemented
                         
                         # If scraping failed but AI provided a price estimate, use that as fallback
                         if scraped_price is None and existing_price is not None:
-                            logger.info(f"Using AI-provided price estimate for {platform_name}: {existing_price}")
+                            logger.info("Using AI-provided price estimate for %s: %s", platform_name, existing_price)
                             scraped_price = existing_price
                         
                         if scraped_price is not None:
                             # Validate price data
                             if not isinstance(scraped_price, (int, float)) or scraped_price <= 0:
-                                logger.warning(f"Invalid price from {platform_name} for product {product.id}: {scraped_price}")
+                                logger.warning("Invalid price from %s for product %s: %s", platform_name, product.id, scraped_price)
                                 continue
                                 
                             # Create new price record for the competitor platform
-                            price_record = PriceRecord(
-                                product_id=product.id,
-                                price=scraped_price,
-                                platform=platform_name,
-                                recorded_at=datetime.utcnow()
-                            )
-                            db.session.add(price_record)
-                            logger.info(f"Updated {platform_name} price for product {product.id}: {scraped_price}")
+                            price_rows.append({
+                                'product_id': product.id,
+                                'price': scraped_price,
+                                'platform': platform_name,
+                                'timestamp': datetime.utcnow()
+                            })
+                            logger.info("Updated %s price for product %s: %s", platform_name, product.id, scraped_price)
                             updated_any_price = True
                         else:
-                            logger.warning(f"Failed to scrape price from {platform_name} URL: {platform_url} for product {product.id}")
+                            logger.warning("Failed to scrape price from %s URL: %s for product %s", platform_name, platform_url, product.id)
                 except Exception as platform_err:
-                    logger.error(f"Error processing {comparison.get('platform', 'unknown')} platform for product {product.id}: {str(platform_err)}")
+                    logger.error("Error processing %s platform for product %s: %s", comparison.get('platform', 'unknown'), product.id, platform_err)
                     # Continue with other platforms despite errors
         else:
-            logger.warning(f"Could not extract metadata for product {product.id} to search other platforms.")
+            logger.warning("Could not extract metadata for product %s to search other platforms.", product.id)
     except Exception as e:
         last_exception = e
-        logger.error(f"Error searching/scraping other platforms for product {product.id}: {str(e)}")
-        logger.debug(traceback.format_exc())
+        logger.error("Error searching/scraping other platforms for product %s: %s", product.id, e)
+        logger.debug("Error details", exc_info=True)
+    
+    if price_rows:
+        db.session.execute(insert(PriceRecord), price_rows)
     
     # If we didn't update any prices successfully, raise the last exception
     # This will trigger a retry in the update_product_with_retries function
@@ -359,29 +376,35 @@ def check_price_alerts(product, new_price):
     """Check if any price alerts should be triggered for the main product price"""
     try:
         # Alerts are currently only tied to the main product price (Amazon)
-        alerts = PriceAlert.query.filter(
+        alerts = db.session.query(PriceAlert.id, PriceAlert.email, PriceAlert.target_price).filter(
             PriceAlert.product_id == product.id,
             PriceAlert.target_price >= new_price,
             PriceAlert.triggered == False
         ).all()
         
-        logger.info(f"Found {len(alerts)} alerts to trigger for product {product.id}")
+        logger.info("Found %s alerts to trigger for product %s", len(alerts), product.id)
+        if not alerts:
+            return
         
-        for alert in alerts:
-            try:
-                # Send email notification
-                send_price_alert_email(alert, product, new_price)
-                
-                # Mark alert as triggered
-                alert.triggered = True
-                alert.triggered_at = datetime.utcnow()
-                alert.triggered_price = new_price
-                db.session.add(alert)
-                
-                logger.info(f"Triggered alert {alert.id} for product {product.id}")
-            except Exception as e:
-                logger.error(f"Error triggering alert {alert.id}: {str(e)}")
-                logger.debug(traceback.format_exc())
+        # The product is already loaded, so build its email payload once and
+        # send every alert over a single SMTP connection
+        product_info = {'id': product.id, 'name': product.title, 'url': product.amazon_url}
+        triples = [
+            ({'id': alert.id, 'email': alert.email, 'target_price': alert.target_price}, product_info, new_price)
+            for alert in alerts
+        ]
+        results = asyncio.run(send_price_alert_emails_batch(triples))
+        
+        # Mark every delivered alert in one UPDATE; the caller commits
+        sent_ids = [alert.id for alert, sent in zip(alerts, results) if sent]
+        if sent_ids:
+            db.session.execute(
+                update(PriceAlert)
+                .where(PriceAlert.id.in_(sent_ids))
+                .values(triggered=True)
+                .execution_options(synchronize_session=False)
+            )
+        logger.info("Triggered %s/%s alerts for product %s", len(sent_ids), len(alerts), product.id)
     except Exception as e:
-        logger.error(f"Error checking price alerts for product {product.id}: {str(e)}")
-        logger.debug(traceback.format_exc())
+        logger.error("Error checking price alerts for product %s: %s", product.id, e)
+        logger.debug("Error details", exc_info=True)
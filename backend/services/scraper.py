@@ -1,13 +1,72 @@
 import requests
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 import logging
-from typing import Dict, Optional, Tuple, Any
+import orjson
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+from concurrent.futures import ThreadPoolExecutor
 import re
-from urllib.parse import urlparse
 import random
+from services.http_client import SESSION
 
 logger = logging.getLogger(__name__)
 
+# Matches /dp/ID, /gp/product/ID and /product/ID in a single pass
+_ASIN_URL_RE = re.compile(r'/(?:dp|gp/product|product)/([A-Z0-9]{10})')
+
+# Bytes read before the first parse attempt; the above-the-fold product block fits well within this
+INITIAL_READ_BYTES = 256_000
+
+# Product pages are 1-3 MB; anything past this is a redirect to a category or search page
+MAX_PAGE_BYTES = 4_000_000
+
+# Amazon's bot-check interstitial names itself within the first chunk of the page
+CAPTCHA_SCAN_BYTES = 65_536
+_CAPTCHA_MARKERS = (b'captcha', b'robot check')
+
+# Request headers sent with every product page fetch; built once and shared by all scrapers
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+# Accepted Amazon hosts, checked against the host captured by _URL_HOST_RE
+_AMAZON_NETLOCS = frozenset({'www.amazon.com', 'amazon.com', 'www.amazon.in', 'amazon.in'})
+
+# Page fetches for scrape_products_bulk; SESSION's connection pool is thread-safe
+BULK_SCRAPE_WORKERS = 8
+_bulk_executor = ThreadPoolExecutor(max_workers=BULK_SCRAPE_WORKERS, thread_name_prefix='amazon-scrape')
+
+# Captures the host of an http(s) URL without a full urlparse; the scheme is case-insensitive,
+# while the host is compared as written, matching urlparse's netloc
+_URL_HOST_RE = re.compile(r'^https?://([^/?#]+)', re.IGNORECASE)
+
+# ISO code for the symbol Amazon renders in span.a-price-symbol
+_CURRENCY_MAP = {'$': 'USD', '₹': 'INR', '€': 'EUR', '£': 'GBP'}
+
+# Fields a scrape must find; currency is reported when present but never required
+_REQUIRED_FIELDS = ('title', 'current_price', 'image_url')
+
+# JSON-LD script bodies, sliced straight out of the raw page so a complete block needs no DOM at all
+_JSON_LD_RE = re.compile(rb'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
+
+# Image and price from the inline image-block/twister script data, in one pass over the raw bytes.
+# priceAmount can belong to other variants, so this only backs up the #ppd-scoped HTML pass;
+# the generic "price" key is left out since carousels and ads on the same page use it too
+_SCRIPT_DATA_RE = re.compile(rb'"hiRes":"([^"]+)"|"priceAmount":(\d+(?:\.\d+)?)')
+
+# Product page selectors, shared by every scrape; selectolax has no compiled selector object
+# to cache, so these stay plain strings
+_PRODUCT_BLOCK_SELECTOR = '#ppd'
+_TITLE_SELECTOR = 'span#productTitle'
+_PRICE_SELECTOR = 'span.a-price-whole'
+_PRICE_SYMBOL_SELECTOR = 'span.a-price-symbol'
+_IMAGE_SELECTOR = 'img#landingImage'
+
+# Only the meta tags extract_from_meta_tags reads, matched by lexbor in one traversal
+_META_TAGS_SELECTOR = (
+    'meta[property="og:title"], meta[property="og:image"], meta[property="product:price:amount"]'
+)
+
 def get_mock_product_data():
     """
     Generate mock product data for testing purposes.
@@ -37,53 +96,167 @@ def get_mock_product_data():
     # Return a random product from the list
     return random.choice(mock_products)
 
+# Currency symbols and spaces that may lead a scraped price
+_PRICE_PREFIX_CHARS = '$₹€£ \u00a0'
+
+def _parse_price_text(text):
+    """Convert a scraped price string like '₹1,20,999.' to a float, or None if it isn't a single price"""
+    if isinstance(text, str):
+        try:
+            return float(text.replace(',', '').lstrip(_PRICE_PREFIX_CHARS))
+        except ValueError:
+            return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    return None
+
+def extract_from_html_elements(tree, fields: Iterable[str] = _REQUIRED_FIELDS) -> Dict[str, Any]:
+    """
+    Extract title, price and image from Amazon's on-page product elements.
+    Only the selectors for the requested fields are run; currency comes with the price.
+    """
+    # Title, price and image sit in the product detail block; searching only that subtree skips the
+    # nav, sponsored carousels and reviews, and keeps a carousel price from being picked up first
+    root = tree.css_first(_PRODUCT_BLOCK_SELECTOR) or tree
+    result = {}
+    
+    if 'title' in fields:
+        title_elem = root.css_first(_TITLE_SELECTOR)
+        result['title'] = title_elem.text(strip=True) if title_elem else None
+    
+    if 'current_price' in fields:
+        price_elem = root.css_first(_PRICE_SELECTOR)
+        symbol_elem = root.css_first(_PRICE_SYMBOL_SELECTOR)
+        result['current_price'] = _parse_price_text(price_elem.text()) if price_elem else None
+        result['currency'] = _CURRENCY_MAP.get(symbol_elem.text(strip=True)[:1]) if symbol_elem else None
+    
+    if 'image_url' in fields:
+        image_elem = root.css_first(_IMAGE_SELECTOR)
+        image_url = None
+        if image_elem:
+            image_url = image_elem.attributes.get('data-old-hires') or image_elem.attributes.get('src')
+        result['image_url'] = image_url
+    
+    return result
+
+def extract_from_json_ld(content: bytes) -> Dict[str, Any]:
+    """Extract title, price and image from a schema.org Product JSON-LD block in the raw page."""
+    for block in _JSON_LD_RE.findall(content):
+        try:
+            data = orjson.loads(block)
+        except orjson.JSONDecodeError:
+            continue
+        
+        if not isinstance(data, dict) or data.get('@type') != 'Product':
+            continue
+        
+        offers = data.get('offers') or {}
+        if isinstance(offers, list):
+            offers = offers[0] if offers else {}
+        
+        image = data.get('image')
+        if isinstance(image, list):
+            image = image[0] if image else None
+        
+        return {
+            'title': data.get('name'),
+            'current_price': _parse_price_text(offers.get('price')),
+            'image_url': image,
+            'currency': offers.get('priceCurrency')
+        }
+    return {}
+
+def extract_from_script_data(content: bytes) -> Dict[str, Any]:
+    """Extract the hi-res image and price from Amazon's inline script data without a DOM walk."""
+    result = {}
+    for match in _SCRIPT_DATA_RE.finditer(content):
+        image, price = match.groups()
+        if image and 'image_url' not in result:
+            result['image_url'] = image.decode('utf-8', 'replace')
+        elif price and 'current_price' not in result:
+            result['current_price'] = float(price)
+        if len(result) == 2:
+            break
+    return result
+
+def extract_from_meta_tags(tree) -> Dict[str, Any]:
+    """Extract title, price and image from OpenGraph/product meta tags."""
+    meta = {}
+    for tag in tree.css(_META_TAGS_SELECTOR):
+        meta[tag.attributes.get('property')] = tag.attributes.get('content')
+    
+    return {
+        'title': meta.get('og:title'),
+        'current_price': _parse_price_text(meta.get('product:price:amount')),
+        'image_url': meta.get('og:image')
+    }
+
+def _fill_missing(product: Dict[str, Any], found: Dict[str, Any]) -> None:
+    """Copy values from found into product for keys product has no value for"""
+    for key, value in found.items():
+        if not product.get(key):
+            product[key] = value
+
 # Standalone function for compatibility with imports
-def scrape_product(url: str) -> Dict[str, Any]:
+def scrape_product(url: str, session: requests.Session = SESSION) -> Dict[str, Any]:
     """
     Scrape product information from Amazon.
     Wrapper around AmazonScraper for compatibility.
     """
-    scraper = AmazonScraper()
-    success, data = scraper.scrape_product(url)
+    success, data = _scraper_for(session).scrape_product(url)
     if success:
         return data
     return {}
 
+def scrape_products_bulk(urls: Iterable[str], session: requests.Session = SESSION) -> List[Tuple[bool, Dict]]:
+    """
+    Scrape many Amazon product URLs concurrently.
+    Returns AmazonScraper.scrape_product results in the same order as urls.
+    Callers do their DB writes afterwards on their own thread.
+    """
+    return list(_bulk_executor.map(_scraper_for(session).scrape_product, urls))
+
 class AmazonScraper:
-    def __init__(self):
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept-Language': 'en-US,en;q=0.9',
-        }
+    def __init__(self, session: requests.Session = SESSION):
+        self.session = session
+        self.headers = DEFAULT_HEADERS
     
     def is_valid_amazon_url(self, url: str) -> bool:
         """Check if the URL is a valid Amazon product URL."""
         try:
-            parsed = urlparse(url)
-            return parsed.netloc in ['www.amazon.com', 'amazon.com', 'www.amazon.in', 'amazon.in']
+            match = _URL_HOST_RE.match(url)
+            return match is not None and match.group(1) in _AMAZON_NETLOCS
         except Exception as e:
-            logger.error(f"Error validating Amazon URL: {e}")
+            logger.error("Error validating Amazon URL: %s", e)
             return False
     
     def extract_product_id(self, url: str) -> Optional[str]:
         """Extract the product ID from an Amazon URL."""
         try:
             # Match patterns like /dp/PRODUCT_ID or /gp/product/PRODUCT_ID
-            patterns = [
-                r'/dp/([A-Z0-9]{10})',
-                r'/gp/product/([A-Z0-9]{10})',
-                r'/product/([A-Z0-9]{10})'
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    return match.group(1)
-            return None
+            match = _ASIN_URL_RE.search(url)
+            return match.group(1) if match else None
         except Exception as e:
-            logger.error(f"Error extracting product ID: {e}")
+            logger.error("Error extracting product ID: %s", e)
             return None
     
+    def _extract_product(self, content: bytes) -> Dict[str, Any]:
+        """
+        Parse the page's JSON-LD from the raw bytes and only build a DOM for fields it leaves missing.
+        The #ppd-scoped HTML pass runs before the page-wide script data and meta tag fallbacks.
+        """
+        product = extract_from_json_ld(content)
+        missing = [key for key in _REQUIRED_FIELDS if not product.get(key)]
+        if missing:
+            # Parse the document once and let the DOM extractors traverse the same tree
+            tree = LexborHTMLParser(content)
+            _fill_missing(product, extract_from_html_elements(tree, missing))
+            if not all(product.get(key) for key in _REQUIRED_FIELDS):
+                _fill_missing(product, extract_from_script_data(content))
+            if not all(product.get(key) for key in _REQUIRED_FIELDS):
+                _fill_missing(product, extract_from_meta_tags(tree))
+        return product
+    
     def scrape_product(self, url: str) -> Tuple[bool, Dict]:
         """
         Scrape product information from Amazon.
@@ -97,36 +270,61 @@ class AmazonScraper:
             if not product_id:
                 return False, {'error': 'Could not extract product ID from URL'}
             
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
+            response = self.session.get(url, headers=self.headers, timeout=10, stream=True)
+            try:
+                response.raise_for_status()
+                
+                content_length = response.headers.get('Content-Length')
+                if content_length and int(content_length) > MAX_PAGE_BYTES:
+                    logger.warning("Skipping oversized Amazon page (%s bytes) for %s", content_length, url)
+                    return False, {'error': 'Page too large to be a product page'}
+                
+                # Title, price and image sit near the top of the page, so try the first chunk alone
+                content = response.raw.read(INITIAL_READ_BYTES, decode_content=True)
+                product = self._extract_product(content)
+                if not all(product.get(key) for key in _REQUIRED_FIELDS):
+                    # Checked only when fields are missing, since product pages may mention captcha in scripts
+                    head = content[:CAPTCHA_SCAN_BYTES].lower()
+                    if any(marker in head for marker in _CAPTCHA_MARKERS):
+                        logger.warning("Amazon served a captcha page for %s", url)
+                        return False, {'error': 'Blocked by Amazon captcha'}
+                    
+                    # Read at most one byte past the cap, enough to tell an oversized page apart
+                    content += response.raw.read(MAX_PAGE_BYTES + 1 - len(content), decode_content=True)
+                    if len(content) > MAX_PAGE_BYTES:
+                        logger.warning("Aborted Amazon page over %s bytes for %s", MAX_PAGE_BYTES, url)
+                        return False, {'error': 'Page too large to be a product page'}
+                    product = self._extract_product(content)
+            finally:
+                response.close()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract title
-            title_elem = soup.find('span', {'id': 'productTitle'})
-            title = title_elem.text.strip() if title_elem else None
-            
-            # Extract price
-            price_elem = soup.find('span', {'class': 'a-price-whole'})
-            price = float(price_elem.text.replace(',', '')) if price_elem else None
-            
-            # Extract image URL
-            image_elem = soup.find('img', {'id': 'landingImage'})
-            image_url = image_elem.get('data-old-hires') or image_elem.get('src') if image_elem else None
+            title = product['title']
+            price = product['current_price']
+            image_url = product['image_url']
             
             if not all([title, price, image_url]):
                 return False, {'error': 'Could not extract all required product information'}
             
-            return True, {
+            data = {
                 'title': title,
                 'current_price': price,
                 'image_url': image_url,
                 'amazon_url': url
             }
+            if product.get('currency'):
+                data['currency'] = product['currency']
+            return True, data
             
         except requests.RequestException as e:
-            logger.error(f"Request error while scraping Amazon: {e}")
+            logger.error("Request error while scraping Amazon: %s", e)
             return False, {'error': 'Failed to fetch product information'}
         except Exception as e:
-            logger.error(f"Error scraping Amazon product: {e}")
-            return False, {'error': 'An unexpected error occurred'}
\ No newline at end of file
+            logger.error("Error scraping Amazon product: %s", e)
+            return False, {'error': 'An unexpected error occurred'}
+
+# Shared instance for the module-level helpers, so each call doesn't build a new scraper
+_default_scraper = AmazonScraper()
+
+def _scraper_for(session: requests.Session) -> AmazonScraper:
+    """The shared scraper for the default session, or a new one bound to a custom session"""
+    return _default_scraper if session is SESSION else AmazonScraper(session=session)
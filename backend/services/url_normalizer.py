@@ -1,11 +1,40 @@
 import re
+import functools
 from urllib.parse import urlparse, parse_qs
 
+# Matches /dp/ASIN or /gp/product/ASIN in a single pass
+_DP_GP_ASIN_RE = re.compile(r'/(?:dp|gp/product)/([A-Z0-9]{10})')
+
+# A bare ASIN path segment
+_ASIN_SEGMENT_RE = re.compile(r'^[A-Z0-9]{10}$')
+
+# Admits an Amazon product URL and captures (host, ASIN) in one anchored scan
+_AMAZON_PRODUCT_URL_RE = re.compile(
+    r'^https?://([^/?#]*amazon\.[^/?#]+)/(?:[^?#]*?/)?(?:dp|gp/product)/([A-Z0-9]{10})'
+)
+
+# A URL already in the canonical https://<host>/dp/<ASIN> form produced below
+_CANONICAL_URL_RE = re.compile(r'^https://[^/?#]*amazon\.[^/?#]+/dp/[A-Z0-9]{10}$')
+
+@functools.lru_cache(maxsize=4096)
 def normalize_amazon_url(url):
     """
     Normalize Amazon product URLs to a canonical format
     Returns the normalized URL with only the essential parts
     """
+    # Stored product URLs are already canonical; return them untouched
+    if _CANONICAL_URL_RE.match(url):
+        return url
+    
+    # Cheap rejection before paying for a full parse
+    if 'amazon.' not in url[:64].lower():
+        return url
+    
+    # Fast path: host check and ASIN capture in a single regex pass
+    product_match = _AMAZON_PRODUCT_URL_RE.match(url)
+    if product_match:
+        return f"https://{product_match.group(1)}/dp/{product_match.group(2)}"
+    
     # Parse the URL
     parsed_url = urlparse(url)
     
@@ -24,22 +53,16 @@ def normalize_amazon_url(url):
     # If ASIN extraction fails, return the original URL
     return url
 
+@functools.lru_cache(maxsize=4096)
 def extract_amazon_asin(url):
     """
     Extract ASIN (Amazon Standard Identification Number) from an Amazon URL
     Returns the ASIN if found, otherwise None
     """
     # Method 1: Extract from /dp/ or /gp/product/ path
-    dp_pattern = r'/dp/([A-Z0-9]{10})'
-    gp_pattern = r'/gp/product/([A-Z0-9]{10})'
-    
-    dp_match = re.search(dp_pattern, url)
-    if dp_match:
-        return dp_match.group(1)
-    
-    gp_match = re.search(gp_pattern, url)
-    if gp_match:
-        return gp_match.group(1)
+    path_match = _DP_GP_ASIN_RE.search(url)
+    if path_match:
+        return path_match.group(1)
     
     # Method 2: Extract from query parameters
     parsed_url = urlparse(url)
@@ -54,7 +77,7 @@ def extract_amazon_asin(url):
     # Method 3: Look for ASIN in the path segments
     path_segments = parsed_url.path.split('/')
     for segment in path_segments:
-        if re.match(r'^[A-Z0-9]{10}$', segment):
+        if _ASIN_SEGMENT_RE.match(segment):
             return segment
     
     # ASIN not found
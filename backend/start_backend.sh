@@ -9,9 +9,13 @@ fi
 # Activate virtual environment
 source venv/bin/activate
 
-# Install dependencies
-echo "Installing dependencies..."
-pip install -r requirements.txt
+# Install dependencies only when requirements.txt changed since the last successful install
+if ! cmp -s requirements.txt venv/.requirements.installed; then
+    echo "Installing dependencies..."
+    pip install -r requirements.txt && cp requirements.txt venv/.requirements.installed
+else
+    echo "Dependencies are up to date."
+fi
 
 # Create .env file if it doesn't exist
 if [ ! -f ".env" ]; then
@@ -15,9 +15,14 @@ REM Activate virtual environment
 echo Activating virtual environment...
 call .venv\Scripts\activate
 
-REM Install dependencies
-echo Installing dependencies...
-pip install -r requirements.txt
+REM Install dependencies only when requirements.txt changed since the last successful install
+fc /b requirements.txt .venv\.requirements.installed >nul 2>&1
+if errorlevel 1 (
+    echo Installing dependencies...
+    pip install -r requirements.txt && copy /y requirements.txt .venv\.requirements.installed >nul
+) else (
+    echo Dependencies are up to date.
+)
 
 REM Start the Flask application
 echo Starting Flask application...
@@ -14,9 +14,17 @@ if (-not (Test-Path ".venv")) {
 Write-Host "Activating virtual environment..." -ForegroundColor Yellow
 & .\.venv\Scripts\Activate.ps1
 
-# Install dependencies
-Write-Host "Installing dependencies..." -ForegroundColor Yellow
-pip install -r requirements.txt
+# Install dependencies only when requirements.txt changed since the last successful install
+$installedRequirements = ".venv\.requirements.installed"
+if ((Test-Path $installedRequirements) -and ((Get-FileHash "requirements.txt").Hash -eq (Get-FileHash $installedRequirements).Hash)) {
+    Write-Host "Dependencies are up to date." -ForegroundColor Green
+} else {
+    Write-Host "Installing dependencies..." -ForegroundColor Yellow
+    pip install -r requirements.txt
+    if ($LASTEXITCODE -eq 0) {
+        Copy-Item "requirements.txt" $installedRequirements
+    }
+}
 
 # Start the Flask application
 Write-Host "Starting Flask application..." -ForegroundColor Green
@@ -6,38 +6,66 @@ from unittest.mock import patch, MagicMock
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.scraper import scrape_product, extract_from_json_ld, extract_from_html_elements, extract_from_meta_tags
+from selectolax.lexbor import LexborHTMLParser
+from services.scraper import AmazonScraper, scrape_product, scrape_products_bulk, extract_from_json_ld, extract_from_html_elements, extract_from_meta_tags, extract_from_script_data
 from services.url_normalizer import normalize_amazon_url, extract_amazon_asin
 
+SAMPLE_PRODUCT_HTML = """
+<html>
+    <head>
+        <meta property="og:title" content="Test Product" />
+        <meta property="og:image" content="https://example.com/image.jpg" />
+        <script type="application/ld+json">
+            {
+                "@type": "Product",
+                "name": "Test Product",
+                "description": "This is a test product",
+                "image": "https://example.com/image.jpg",
+                "offers": {
+                    "price": 99.99,
+                    "priceCurrency": "USD"
+                }
+            }
+        </script>
+    </head>
+    <body>
+        <div id="productTitle">Test Product</div>
+        <div id="priceblock_ourprice">$99.99</div>
+        <img id="landingImage" data-old-hires="https://example.com/image.jpg" />
+    </body>
+</html>
+"""
+
+NORMALIZE_URL_CASES = [
+    ('https://www.amazon.com/dp/B08N5KWB9H', 'https://www.amazon.com/dp/B08N5KWB9H'),
+    ('https://www.amazon.com/Sony-WH-1000XM4-Canceling-Headphones-phone-call/dp/B08N5KWB9H/ref=sr_1_1', 'https://www.amazon.com/dp/B08N5KWB9H'),
+    ('https://www.amazon.com/gp/product/B08N5KWB9H', 'https://www.amazon.com/dp/B08N5KWB9H'),
+    ('https://www.amazon.com/gp/product/B08N5KWB9H?pf_rd_r=ABC123', 'https://www.amazon.com/dp/B08N5KWB9H'),
+    ('https://www.amazon.in/dp/B08N5KWB9H', 'https://www.amazon.in/dp/B08N5KWB9H'),
+]
+
+EXTRACT_ASIN_CASES = [
+    ('https://www.amazon.com/dp/B08N5KWB9H', 'B08N5KWB9H'),
+    ('https://www.amazon.com/Sony-WH-1000XM4-Canceling-Headphones-phone-call/dp/B08N5KWB9H/ref=sr_1_1', 'B08N5KWB9H'),
+    ('https://www.amazon.com/gp/product/B08N5KWB9H', 'B08N5KWB9H'),
+    ('https://www.amazon.com/gp/product/B08N5KWB9H?pf_rd_r=ABC123', 'B08N5KWB9H'),
+    ('https://www.amazon.com/some-product/B08N5KWB9H/', 'B08N5KWB9H'),
+    ('https://www.amazon.com/some-product/?ASIN=B08N5KWB9H', 'B08N5KWB9H'),
+]
+
 class TestScraper(unittest.TestCase):
     
-    @patch('services.scraper.requests.get')
+    @classmethod
+    def setUpClass(cls):
+        # Encode and parse the fixture once and share it across test cases
+        cls.sample_html = SAMPLE_PRODUCT_HTML.encode()
+        cls.sample_tree = LexborHTMLParser(cls.sample_html)
+    
+    @patch('services.http_client.SESSION.get')
     def test_scrape_amazon_product_success(self, mock_get):
-        # Mock response
+        # Mock streamed response
         mock_response = MagicMock()
-        mock_response.content = """
-        <html>
-            <head>
-                <script type="application/ld+json">
-                    {
-                        "@type": "Product",
-                        "name": "Test Product",
-                        "description": "This is a test product",
-                        "image": "https://example.com/image.jpg",
-                        "offers": {
-                            "price": 99.99,
-                            "priceCurrency": "USD"
-                        }
-                    }
-                </script>
-            </head>
-            <body>
-                <div id="productTitle">Test Product</div>
-                <div id="priceblock_ourprice">$99.99</div>
-                <img id="landingImage" data-old-hires="https://example.com/image.jpg" />
-            </body>
-        </html>
-        """
+        mock_response.raw.read.side_effect = [self.sample_html, b'']
         mock_response.raise_for_status = MagicMock()
         mock_get.return_value = mock_response
         
@@ -46,71 +74,64 @@ class TestScraper(unittest.TestCase):
         
         # Assertions
         self.assertIsNotNone(result)
-        self.assertEqual(result['name'], "Test Product")
-        self.assertEqual(result['price'], 99.99)
+        self.assertEqual(result['title'], "Test Product")
+        self.assertEqual(result['current_price'], 99.99)
+        self.assertEqual(result['image_url'], "https://example.com/image.jpg")
+    
+    @patch('services.http_client.SESSION.get')
+    def test_scrape_amazon_product_captcha(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.raw.read.side_effect = [b'<html><title>Robot Check</title></html>', b'']
+        mock_get.return_value = mock_response
+        
+        success, data = AmazonScraper().scrape_product("https://www.amazon.com/dp/B08N5KWB9H")
+        
+        # The page is rejected after the first read, without fetching the rest
+        self.assertFalse(success)
+        self.assertIn('captcha', data['error'])
+        mock_response.raw.read.assert_called_once()
+    
+    @patch('services.scraper.AmazonScraper.scrape_product')
+    def test_scrape_products_bulk_preserves_order(self, mock_scrape):
+        mock_scrape.side_effect = lambda url: (True, {'amazon_url': url})
+        urls = [f"https://www.amazon.com/dp/B08N5KWB{i:02d}" for i in range(20)]
+        
+        results = scrape_products_bulk(urls)
+        
+        self.assertEqual([data['amazon_url'] for _, data in results], urls)
+    
+    def test_extract_from_json_ld(self):
+        result = extract_from_json_ld(self.sample_html)
+        self.assertEqual(result['title'], "Test Product")
+        self.assertEqual(result['current_price'], 99.99)
+        self.assertEqual(result['currency'], "USD")
+    
+    def test_extract_from_html_elements(self):
+        result = extract_from_html_elements(self.sample_tree)
         self.assertEqual(result['image_url'], "https://example.com/image.jpg")
     
+    def test_extract_from_meta_tags(self):
+        result = extract_from_meta_tags(self.sample_tree)
+        self.assertEqual(result['title'], "Test Product")
+        self.assertEqual(result['image_url'], "https://example.com/image.jpg")
+    
+    def test_extract_from_script_data(self):
+        content = b'<script>var data = {"hiRes":"https://example.com/hires.jpg","priceAmount":1299.5};</script>'
+        result = extract_from_script_data(content)
+        self.assertEqual(result['image_url'], "https://example.com/hires.jpg")
+        self.assertEqual(result['current_price'], 1299.5)
+    
     def test_normalize_amazon_url(self):
         # Test various Amazon URL formats
-        test_cases = [
-            {
-                'input': 'https://www.amazon.com/dp/B08N5KWB9H',
-                'expected': 'https://www.amazon.com/dp/B08N5KWB9H'
-            },
-            {
-                'input': 'https://www.amazon.com/Sony-WH-1000XM4-Canceling-Headphones-phone-call/dp/B08N5KWB9H/ref=sr_1_1',
-                'expected': 'https://www.amazon.com/dp/B08N5KWB9H'
-            },
-            {
-                'input': 'https://www.amazon.com/gp/product/B08N5KWB9H',
-                'expected': 'https://www.amazon.com/dp/B08N5KWB9H'
-            },
-            {
-                'input': 'https://www.amazon.com/gp/product/B08N5KWB9H?pf_rd_r=ABC123',
-                'expected': 'https://www.amazon.com/dp/B08N5KWB9H'
-            },
-            {
-                'input': 'https://www.amazon.in/dp/B08N5KWB9H',
-                'expected': 'https://www.amazon.in/dp/B08N5KWB9H'
-            }
-        ]
-        
-        for case in test_cases:
-            result = normalize_amazon_url(case['input'])
-            self.assertEqual(result, case['expected'])
+        for url, expected in NORMALIZE_URL_CASES:
+            with self.subTest(url=url):
+                self.assertEqual(normalize_amazon_url(url), expected)
     
     def test_extract_amazon_asin(self):
         # Test ASIN extraction from various URL formats
-        test_cases = [
-            {
-                'input': 'https://www.amazon.com/dp/B08N5KWB9H',
-                'expected': 'B08N5KWB9H'
-            },
-            {
-                'input': 'https://www.amazon.com/Sony-WH-1000XM4-Canceling-Headphones-phone-call/dp/B08N5KWB9H/ref=sr_1_1',
-                'expected': 'B08N5KWB9H'
-            },
-            {
-                'input': 'https://www.amazon.com/gp/product/B08N5KWB9H',
-                'expected': 'B08N5KWB9H'
-            },
-            {
-                'input': 'https://www.amazon.com/gp/product/B08N5KWB9H?pf_rd_r=ABC123',
-                'expected': 'B08N5KWB9H'
-            },
-            {
-                'input': 'https://www.amazon.com/some-product/B08N5KWB9H/',
-                'expected': 'B08N5KWB9H'
-            },
-            {
-                'input': 'https://www.amazon.com/some-product/?ASIN=B08N5KWB9H',
-                'expected': 'B08N5KWB9H'
-            }
-        ]
-        
-        for case in test_cases:
-            result = extract_amazon_asin(case['input'])
-            self.assertEqual(result, case['expected'])
+        for url, expected in EXTRACT_ASIN_CASES:
+            with self.subTest(url=url):
+                self.assertEqual(extract_amazon_asin(url), expected)
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,7 +2,8 @@
 Database Schema Update Script
 
 This script updates the price_records table to add the 'platform' column
-that is defined in the model but missing from the actual database schema.
+that is defined in the model but missing from the actual database schema,
+and creates the lookup indexes on price_records, price_alerts and price_history.
 """
 import os
 import sys
@@ -47,10 +48,9 @@ def update_sqlite_schema():
         
         # Check if the platform column exists
         cursor.execute("PRAGMA table_info(price_records)")
-        columns = cursor.fetchall()
-        column_names = [column[1] for column in columns]
+        has_platform = any(column[1] == 'platform' for column in cursor)
         
-        if 'platform' not in column_names:
+        if not has_platform:
             logger.info("'platform' column does not exist in price_records table. Adding it now...")
             
             # Add the platform column with default value 'Amazon'
@@ -61,6 +61,22 @@ def update_sqlite_schema():
         else:
             logger.info("'platform' column already exists in price_records table")
         
+        # Create lookup indexes that db.create_all() only adds on fresh databases
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_price_records_product_ts "
+            "ON price_records (product_id, timestamp DESC)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_price_alerts_product_email "
+            "ON price_alerts (product_id, email)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_price_history_product_ts "
+            "ON price_history (product_id, timestamp)"
+        )
+        conn.commit()
+        logger.info("Ensured price_records, price_alerts and price_history lookup indexes exist")
+        
         # Close the connection
         conn.close()
         return True
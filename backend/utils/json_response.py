@@ -0,0 +1,29 @@
+import orjson
+from flask import current_app, request
+
+def ojsonify(payload, status=200):
+    """
+    Build a JSON response using orjson instead of the stdlib encoder.
+    Used by the high-volume routes where encoding dominates response time.
+    """
+    return json_bytes_response(orjson.dumps(payload), status)
+
+def json_bytes_response(body, status=200):
+    """Wrap already-encoded JSON bytes (e.g. from a response cache) in a response"""
+    return current_app.response_class(
+        body,
+        status=status,
+        mimetype='application/json'
+    )
+
+def load_json_body():
+    """
+    Decode the request body with orjson, skipping Flask's content-type sniffing
+    and body caching. Returns None when the request has no body; raises
+    orjson.JSONDecodeError on malformed input.
+    """
+    # Test the body itself: chunked uploads carry no Content-Length
+    body = request.get_data(cache=False)
+    if not body:
+        return None
+    return orjson.loads(body)
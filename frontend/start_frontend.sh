@@ -1,8 +1,16 @@
 #!/bin/bash
 
-# Install dependencies
-echo "Installing dependencies..."
-npm install
+# Check that npm is on PATH without starting a Node process
+if ! command -v npm &> /dev/null; then
+    echo "Error: Node.js/npm is not installed or not in PATH."
+    exit 1
+fi
+
+# Install dependencies only when node_modules is missing or older than the lockfile
+if [ ! -d "node_modules" ] || [ package-lock.json -nt node_modules/.package-lock.json ]; then
+    echo "Installing dependencies..."
+    npm install
+fi
 
 # Create .env file if it doesn't exist
 if [ ! -f ".env" ]; then